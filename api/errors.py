@@ -0,0 +1,7 @@
+class ApiError(Exception):
+    """Error returned to the client as a JSON body."""
+
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
@@ -0,0 +1,119 @@
+"""
+Serializers of the JSON API.
+
+Every field declares the relations it reads, so a queryset is prepared
+with select_related and prefetch_related for exactly the requested
+fields, and a page is serialized with a fixed number of queries.
+"""
+from collections import namedtuple
+
+from django.core.exceptions import ObjectDoesNotExist
+
+from .errors import ApiError
+
+Field = namedtuple(
+    'Field', ('get', 'select_related', 'prefetch_related'),
+    defaults=((), ()))
+
+
+class Serializer:
+    fields = {}
+
+    def __init__(self, field_names=None):
+        if not field_names:
+            field_names = list(self.fields)
+        unknown = [name for name in field_names if name not in self.fields]
+        if unknown:
+            raise ApiError(
+                'Неизвестные поля: {}.'.format(', '.join(unknown)))
+        self.field_names = field_names
+
+    def prepare(self, queryset):
+        """Load the relations used by the selected fields."""
+        select_related = set()
+        prefetch_related = set()
+        for name in self.field_names:
+            select_related.update(self.fields[name].select_related)
+            prefetch_related.update(self.fields[name].prefetch_related)
+        if select_related:
+            queryset = queryset.select_related(*sorted(select_related))
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*sorted(prefetch_related))
+        return queryset
+
+    def serialize(self, obj):
+        return {name: self.fields[name].get(obj) for name in self.field_names}
+
+
+def _image_url(post):
+    return post.image.url if post.image else None
+
+
+def _image_variants(post):
+    if not post.image:
+        return []
+    return [
+        {
+            'url': variant.file.url,
+            'width': variant.width,
+            'height': variant.height,
+            'format': variant.format,
+        }
+        for variant in post.image_variants.all()
+        if variant.source == post.image.name
+    ]
+
+
+def _counter(name):
+    def get(user):
+        try:
+            return getattr(user.counters, name)
+        except ObjectDoesNotExist:
+            return 0
+    return get
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': Field(lambda post: post.pk),
+        'text': Field(lambda post: post.text),
+        'pub_date': Field(lambda post: post.pub_date),
+        'author': Field(lambda post: post.author.username, ('author',)),
+        'group': Field(
+            lambda post: post.group.slug if post.group_id else None,
+            ('group',)),
+        'image': Field(_image_url),
+        'image_variants': Field(_image_variants, (), ('image_variants',)),
+        'comment_count': Field(lambda post: post.comment_count),
+    }
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'id': Field(lambda group: group.pk),
+        'title': Field(lambda group: group.title),
+        'slug': Field(lambda group: group.slug),
+        'description': Field(lambda group: group.description),
+    }
+
+
+class ProfileSerializer(Serializer):
+    fields = {
+        'id': Field(lambda user: user.pk),
+        'username': Field(lambda user: user.username),
+        'full_name': Field(lambda user: user.get_full_name()),
+        'posts_count': Field(_counter('posts_count'), ('counters',)),
+        'followers_count': Field(_counter('followers_count'), ('counters',)),
+        'following_count': Field(_counter('following_count'), ('counters',)),
+    }
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': Field(lambda comment: comment.pk),
+        'post': Field(lambda comment: comment.post_id),
+        'author': Field(
+            lambda comment: comment.author.username, ('author',)),
+        'text': Field(lambda comment: comment.text),
+        'created': Field(lambda comment: comment.created),
+    }
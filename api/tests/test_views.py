@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.pagination import encode_cursor
+
+User = get_user_model()
+
+
+class ApiViewsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='Artur')
+        self.follower = User.objects.create_user(username='Miniput')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        Post.objects.bulk_create([Post(
+            text=f'Тестовый пост {number}',
+            author=self.author,
+            group=self.group) for number in range(25)])
+        self.post = Post.objects.first()
+        Comment.objects.create(
+            post=self.post, author=self.follower, text='Комментарий')
+        self.client = Client()
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_post_list_walks_all_posts(self):
+        """Cursor pages of the API cover every post once."""
+        url = reverse('api:post_list')
+        first_page = self.get_json(url)
+        self.assertEqual(len(first_page['results']), 20)
+        self.assertIsNone(first_page['previous'])
+        response = self.client.get(url, {'after': 'сломанный'})
+        self.assertEqual(
+            response.status_code, 400,
+            'Неверный курсор не должен давать первую страницу.')
+        response = self.client.get(url, {'after': encode_cursor([1, 2])})
+        self.assertEqual(
+            response.status_code, 400,
+            'Курсор со значениями не того типа должен отклоняться.')
+        second_page = self.get_json(url, after=first_page['next'])
+        self.assertEqual(len(second_page['results']), 5)
+        self.assertIsNone(second_page['next'])
+        self.assertEqual(
+            {post['id'] for post in first_page['results']
+             + second_page['results']},
+            set(Post.objects.values_list('pk', flat=True)),
+            'API теряет или повторяет посты.')
+        self.assertEqual(
+            first_page['results'][0]['author'], self.author.username)
+        self.assertEqual(first_page['results'][0]['group'], self.group.slug)
+
+    def test_fields_and_ids(self):
+        """Sparse fields and batch lookup return only what is asked."""
+        posts = list(Post.objects.all()[:3])
+        data = self.get_json(
+            reverse('api:post_list'), fields='id,text',
+            ids=','.join(str(post.pk) for post in reversed(posts)))
+        self.assertEqual(data['results'], [
+            {'id': post.pk, 'text': post.text} for post in reversed(posts)])
+        response = self.client.get(
+            reverse('api:post_list'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('api:post_list'), {'ids': 'a'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_costs_fixed_number_of_queries(self):
+        """Serializing a bigger page doesn't run more queries."""
+        url = reverse('api:post_list')
+        counts = []
+        for page_size in (5, 20):
+            with override_settings(API_PAGE_SIZE=page_size):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[1], 3)
+
+    def test_etag_revalidation(self):
+        """Unchanged responses are revalidated with 304."""
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertFalse(
+            etag.startswith('W/'), 'ETag ответов API должен быть сильным.')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(
+            len(queries), 1, 'ETag должен строиться без выполнения view.')
+        self.assertNotEqual(
+            self.client.get(url, {'fields': 'id'})['ETag'], etag)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['text'], 'Новый текст')
+        etag = response['ETag']
+        self.author.username = 'Arturo'
+        self.author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['author'], 'Arturo')
+        url = reverse('api:comment_list', kwargs={'post_id': self.post.pk})
+        etag = self.client.get(url)['ETag']
+        self.follower.username = 'Minipoot'
+        self.follower.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['author'], 'Minipoot')
+
+    def test_related_endpoints(self):
+        """Groups, profiles, comments and the follow feed are served."""
+        group = self.get_json(
+            reverse('api:group_detail', kwargs={'slug': self.group.slug}))
+        self.assertEqual(group['title'], self.group.title)
+        profile = self.get_json(reverse(
+            'api:profile_detail', kwargs={'username': 'Artur'}))
+        self.assertEqual(profile['username'], 'Artur')
+        self.assertEqual(profile['following_count'], 0)
+        comments = self.get_json(reverse(
+            'api:comment_list', kwargs={'post_id': self.post.pk}))
+        self.assertEqual(comments['results'][0]['text'], 'Комментарий')
+        follow_url = reverse('api:follow_feed')
+        self.assertEqual(self.client.get(follow_url).status_code, 401)
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.client.force_login(self.follower)
+        self.assertEqual(len(self.get_json(follow_url)['results']), 20)
+        response = self.client.get(reverse(
+            'api:group_detail', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('detail', response.json())
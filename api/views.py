@@ -0,0 +1,214 @@
+"""
+Read-only JSON API, version 1.
+
+Lists are paginated by cursors: `after` and `before` take the tokens
+from `next` and `previous` of a page. `fields` selects a comma
+separated subset of the fields and `ids` looks a batch of objects up by
+their ids instead of paging. Responses carry an ETag built from the
+versions of the feed cache scopes the view reads and its query, so
+clients revalidate them with If-None-Match without the view running.
+The JSON of one set of versions is the same byte for byte, the ETag is
+strong.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+from django.views.decorators.vary import vary_on_cookie
+
+from posts import timeline
+from posts.cache import page_etag
+from posts.models import Group, Post
+from posts.pagination import CursorPaginator, InvalidCursor
+
+from .errors import ApiError
+from .serializers import (CommentSerializer, GroupSerializer,
+                          PostSerializer, ProfileSerializer)
+
+User = get_user_model()
+
+
+def _json_response(data, status=200):
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def api_view(etag_scopes):
+    """
+    Turn the data returned by the view into a revalidatable response.
+    etag_scopes(request, *args, **kwargs) lists the cache scopes of the
+    data, or returns None when the object is missing.
+    """
+    def decorator(view):
+        @require_safe
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            scopes = etag_scopes(request, *args, **kwargs)
+            etag = None
+            if scopes is not None:
+                # Pages, fields and ids of one view differ by the query.
+                query = hashlib.sha1(
+                    request.GET.urlencode().encode()).hexdigest()
+                etag = page_etag(
+                    request, *scopes, variant=query, weak=False)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                try:
+                    response = _json_response(view(request, *args, **kwargs))
+                except ApiError as error:
+                    return _json_response(
+                        {'detail': error.detail}, error.status)
+                except Http404:
+                    return _json_response({'detail': 'Не найдено.'}, 404)
+            if etag is not None:
+                response['ETag'] = etag
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _scopes(*scopes):
+    return lambda request, *args, **kwargs: list(scopes)
+
+
+def _post_scopes(request, post_id):
+    # Edits and comments of a post bump the scope of its author.
+    author_id = Post.objects.filter(pk=post_id).order_by().values_list(
+        'author_id', flat=True).first()
+    return None if author_id is None else [f'author:{author_id}']
+
+
+def _group_scopes(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list('pk', flat=True).first()
+    return None if group_id is None else [f'group:{group_id}']
+
+
+def _author_scopes(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    return None if author_id is None else [f'author:{author_id}']
+
+
+def _follow_scopes(request):
+    if not request.user.is_authenticated:
+        return None
+    # Posts of the followed authors bump the index, follows of the
+    # user bump the user's own scope.
+    return ['index', f'author:{request.user.pk}']
+
+
+def _get_serializer(request, serializer_class):
+    fields = request.GET.get('fields')
+    if fields is None:
+        return serializer_class()
+    return serializer_class(
+        [name.strip() for name in fields.split(',') if name.strip()])
+
+
+def _get_ids(request):
+    try:
+        ids = [int(value) for value in request.GET['ids'].split(',')]
+    except ValueError:
+        raise ApiError('Параметр ids должен быть списком чисел.')
+    if len(ids) > settings.API_MAX_IDS:
+        raise ApiError(
+            f'Можно запросить не больше {settings.API_MAX_IDS} объектов.')
+    return ids
+
+
+def _list(request, queryset, serializer_class, ordering=('-id',)):
+    """Serialize a page of the queryset or the objects listed in `ids`."""
+    serializer = _get_serializer(request, serializer_class)
+    queryset = serializer.prepare(queryset)
+    if 'ids' in request.GET:
+        ids = _get_ids(request)
+        objects = queryset.in_bulk(ids)
+        return {'results': [
+            serializer.serialize(objects[pk]) for pk in ids
+            if pk in objects]}
+    paginator = CursorPaginator(queryset, settings.API_PAGE_SIZE, ordering)
+    try:
+        page = paginator.page(
+            request.GET.get('after'), request.GET.get('before'))
+    except InvalidCursor:
+        raise ApiError('Неверный курсор страницы.')
+    return {
+        'results': [serializer.serialize(obj) for obj in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def _detail(request, queryset, serializer_class, **lookup):
+    serializer = _get_serializer(request, serializer_class)
+    return serializer.serialize(
+        get_object_or_404(serializer.prepare(queryset), **lookup))
+
+
+@api_view(_scopes('index'))
+def post_list(request):
+    return _list(request, Post.objects.all(), PostSerializer,
+                 ('-pub_date', '-id'))
+
+
+@api_view(_post_scopes)
+def post_detail(request, post_id):
+    return _detail(request, Post.objects.all(), PostSerializer, pk=post_id)
+
+
+@api_view(_post_scopes)
+def comment_list(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return _list(request, post.comments.all(), CommentSerializer,
+                 ('-created', '-id'))
+
+
+@api_view(_scopes('groups'))
+def group_list(request):
+    return _list(request, Group.objects.all(), GroupSerializer, ('id',))
+
+
+@api_view(_group_scopes)
+def group_detail(request, slug):
+    return _detail(request, Group.objects.all(), GroupSerializer, slug=slug)
+
+
+@api_view(_group_scopes)
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return _list(request, group.posts.all(), PostSerializer,
+                 ('-pub_date', '-id'))
+
+
+@api_view(_scopes('index', 'profiles'))
+def profile_list(request):
+    return _list(request, User.objects.all(), ProfileSerializer, ('id',))
+
+
+@api_view(_author_scopes)
+def profile_detail(request, username):
+    return _detail(
+        request, User.objects.all(), ProfileSerializer, username=username)
+
+
+@api_view(_author_scopes)
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return _list(request, author.posts.all(), PostSerializer,
+                 ('-pub_date', '-id'))
+
+
+@vary_on_cookie
+@api_view(_follow_scopes)
+def follow_feed(request):
+    if not request.user.is_authenticated:
+        raise ApiError('Требуется авторизация.', 401)
+    return _list(request, timeline.feed_for(request.user), PostSerializer,
+                 timeline.FEED_ORDERING)
@@ -0,0 +1,16 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def test_settings(django_test_environment):
+    from django.test import override_settings
+
+    from yatube.testing import TEST_SETTINGS
+    with override_settings(**TEST_SETTINGS):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def empty_caches(test_settings):
+    from yatube.testing import clear_caches
+    clear_caches()
@@ -4,6 +4,13 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     name = 'posts'
 
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import signals
+
+        post_migrate.connect(signals.repair_search_index, sender=self)
+
 
 if __name__ == '__main__':
     pass
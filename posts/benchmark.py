@@ -0,0 +1,263 @@
+"""
+Benchmarks of the posts views.
+
+Every view is requested through the test client against the data in
+the current database, with the cache cleared before each request so
+the full work of the view is measured. The runs get caches of their
+own in memory, clearing them leaves the cache of the site alone. Pages
+are also measured warm, as `<name>:warm`, with the cache kept between
+requests. Wall time is the fastest of several requests, the least
+disturbed by the rest of the machine;
+queries come from the metrics middleware and peak memory from a
+separate request traced by tracemalloc, which would slow the timed
+ones down.
+
+run_concurrent() measures throughput instead: writer processes post,
+comment and follow while reader processes open profiles and posts, all
+through the test client against a database file shared by the forked
+processes.
+"""
+import multiprocessing
+import random
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from .models import Group, Post
+
+User = get_user_model()
+
+# The two tiers of settings.CACHES, both kept in memory.
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'yatube.cache.TwoTierCache',
+        'LOCATION': 'benchmark',
+        'OPTIONS': {'SHARED': 'shared'},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark-shared',
+    },
+}
+
+
+def _top(queryset, field):
+    return queryset.annotate(total=Count(field)).order_by('-total').first()
+
+
+def view_requests():
+    """
+    Requests of every benchmarked view: name -> (user, method, url,
+    data). The biggest group, author, post and timeline are used.
+    """
+    author = _top(User.objects.all(), 'posts')
+    follower = _top(User.objects.all(), 'timeline')
+    group = _top(Group.objects.all(), 'posts')
+    post = Post.objects.order_by('-comment_count', '-pk').first()
+    if None in (author, follower, group, post):
+        raise ValueError('The database has no posts, groups or follows')
+    post_kwargs = {'username': post.author.username, 'post_id': post.pk}
+    return {
+        'index': (None, 'get', reverse('posts:index'), None),
+        'group_posts': (None, 'get', reverse(
+            'posts:group_posts', kwargs={'slug': group.slug}), None),
+        'profile': (None, 'get', reverse(
+            'posts:profile', kwargs={'username': author.username}), None),
+        'post_view': (
+            None, 'get', reverse('posts:post', kwargs=post_kwargs), None),
+        'follow_index': (
+            follower, 'get', reverse('posts:follow_index'), None),
+        'new_post': (follower, 'post', reverse('posts:new_post'),
+                     {'text': 'Пост из бенчмарка'}),
+        'add_comment': (follower, 'post', reverse(
+            'posts:add_comment', kwargs=post_kwargs),
+            {'text': 'Комментарий из бенчмарка'}),
+    }
+
+
+def _request(client, method, url, data, warm=False):
+    if not warm:
+        cache.clear()
+    response = getattr(client, method)(url, data or {})
+    if response.status_code not in (200, 302):
+        raise RuntimeError(f'{url} returned {response.status_code}')
+    return response
+
+
+def measure(user, method, url, data, iterations=10, warm=False):
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    # The first request warms up imports, templates and connections.
+    _request(client, method, url, data)
+    timings = []
+    queries = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = _request(client, method, url, data, warm)
+        timings.append((time.perf_counter() - start) * 1000)
+        queries.append(response.view_metrics['queries'])
+    tracemalloc.start()
+    try:
+        _request(client, method, url, data, warm)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'time_ms': round(min(timings), 2),
+        'queries': max(queries),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run(iterations=10, views=None):
+    """Measure the views, all of them by default."""
+    results = {}
+    with override_settings(CACHES=BENCHMARK_CACHES):
+        for name, request in view_requests().items():
+            if views is not None and name not in views:
+                continue
+            results[name] = measure(*request, iterations=iterations)
+            if request[1] == 'get':
+                results[f'{name}:warm'] = measure(
+                    *request, iterations=iterations, warm=True)
+    return results
+
+
+def compare(results, baseline, time_threshold=0.5, memory_threshold=0.25,
+            time_slack_ms=5.0):
+    """
+    Return regressions of the results against the baseline as
+    messages. Any extra query is a regression; time and memory may
+    grow by the threshold shares, time also by the absolute slack that
+    absorbs the noise of very fast views.
+    """
+    regressions = []
+    for name, current in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if current['queries'] > expected['queries']:
+            regressions.append(
+                f'{name}: {current["queries"]} queries, '
+                f'baseline {expected["queries"]}')
+        time_limit = (expected['time_ms'] * (1 + time_threshold)
+                      + time_slack_ms)
+        if current['time_ms'] > time_limit:
+            regressions.append(
+                f'{name}: {current["time_ms"]} ms, '
+                f'baseline {expected["time_ms"]} ms')
+        memory_limit = expected['peak_kb'] * (1 + memory_threshold)
+        if current['peak_kb'] > memory_limit:
+            regressions.append(
+                f'{name}: {current["peak_kb"]} KiB peak, '
+                f'baseline {expected["peak_kb"]} KiB')
+    return regressions
+
+
+def _write(client, rng, authors, posts):
+    operation = rng.choice(('new_post', 'add_comment', 'follow'))
+    if operation == 'new_post':
+        return client.post(
+            reverse('posts:new_post'), {'text': 'Пост из бенчмарка'})
+    if operation == 'add_comment':
+        username, post_id = rng.choice(posts)
+        return client.post(
+            reverse('posts:add_comment', args=(username, post_id)),
+            {'text': 'Комментарий из бенчмарка'})
+    name = rng.choice(('posts:profile_follow', 'posts:profile_unfollow'))
+    return client.get(reverse(name, args=(rng.choice(authors),)))
+
+
+def _read(client, rng, authors, posts):
+    if rng.random() < 0.5:
+        return client.get(
+            reverse('posts:profile', args=(rng.choice(authors),)))
+    return client.get(reverse('posts:post', args=rng.choice(posts)))
+
+
+def _worker(role, number, seconds, authors, posts, barrier, queue):
+    rng = random.Random(number)
+    client = Client()
+    if role == 'writer':
+        client.force_login(User.objects.get(username=authors[number]))
+    operations = errors = 0
+    latencies = []
+    barrier.wait()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            if role == 'writer':
+                response = _write(client, rng, authors, posts)
+            else:
+                response = _read(client, rng, authors, posts)
+        except DatabaseError:
+            # "database is locked" and other lock failures.
+            errors += 1
+        else:
+            if response.status_code in (200, 302):
+                operations += 1
+            else:
+                errors += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+    connections.close_all()
+    queue.put((role, operations, errors, latencies))
+
+
+def _percentile(values, share):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * share))], 2)
+
+
+def run_concurrent(writers=4, readers=4, seconds=5.0):
+    """
+    Run the writer and reader processes for the given seconds and
+    return throughput, errors and latency percentiles of each role.
+    """
+    authors = list(
+        User.objects.order_by('pk').values_list('username', flat=True)
+        [:max(writers, 1) * 10])
+    posts = list(
+        Post.objects.order_by('-pk')
+        .values_list('author__username', 'pk')[:1000])
+    if len(authors) < writers or not posts:
+        raise ValueError('The database has too few users or posts')
+    # The forked processes must open connections of their own.
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(writers + readers)
+    queue = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(
+            role, number, seconds, authors, posts, barrier, queue))
+        for role, count in (('writer', writers), ('reader', readers))
+        for number in range(count)]
+    for process in processes:
+        process.start()
+    results = {
+        role: {'operations': 0, 'errors': 0, 'latencies': []}
+        for role in ('writer', 'reader')}
+    for _ in processes:
+        role, operations, errors, latencies = queue.get()
+        results[role]['operations'] += operations
+        results[role]['errors'] += errors
+        results[role]['latencies'] += latencies
+    for process in processes:
+        process.join()
+    return {
+        role: {
+            'per_second': round(result['operations'] / seconds, 1),
+            'errors': result['errors'],
+            'p50_ms': _percentile(result['latencies'], 0.5),
+            'p95_ms': _percentile(result['latencies'], 0.95),
+        }
+        for role, result in results.items()}
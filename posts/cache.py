@@ -0,0 +1,104 @@
+"""
+Versioned keys for cached feed fragments.
+
+Every feed scope (the index, a group, an author) has a version number
+kept in the cache. Fragment keys include the versions, so bumping a
+version on a write makes the old fragments unreachable at once.
+"""
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.utils.safestring import mark_safe
+
+VERSION_KEY = 'feed-version:{}'
+
+
+def _new_version():
+    # Versions start from the clock, so a version key evicted from the
+    # cache never comes back with a value used by older fragments.
+    return int(time.time() * 1000)
+
+
+def get_versions(*scopes):
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = _new_version()
+            cache.add(key, versions[key], None)
+    return [versions[key] for key in keys]
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def bump(*scopes):
+    """
+    Invalidate fragments of the scopes now and once more after commit,
+    so a page rendered from not yet committed data isn't kept.
+    """
+    _bump(scopes)
+    transaction.on_commit(partial(_bump, scopes))
+
+
+def post_scopes(author_id, *group_ids):
+    scopes = ['index', f'author:{author_id}']
+    scopes.extend(
+        f'group:{group_id}' for group_id in group_ids if group_id)
+    return scopes
+
+
+def _viewer(request):
+    return request.user.pk if request.user.is_authenticated else 0
+
+
+def _freshness(request):
+    # Replicas may lag behind the bumped versions, pages read from them
+    # are only kept for REPLICA_MAX_LAG seconds or so.
+    if getattr(request, 'read_replica', None) is None:
+        return 0
+    return int(time.time() // settings.REPLICA_MAX_LAG)
+
+
+def page_etag(request, *scopes, variant=None, weak=True):
+    """
+    ETag of a page built from the scopes for the current viewer.
+    It is computed from the versions alone, before the page is rendered.
+    The variant tells apart the pages of the same scopes. Pages whose
+    bytes depend on anything but the versions should keep the tag weak.
+    """
+    versions = get_versions(*scopes)
+    parts = [*scopes, *versions, _viewer(request), _freshness(request)]
+    if variant is not None:
+        parts.append(variant)
+    etag = '"{}"'.format(':'.join(str(part) for part in parts))
+    return 'W/' + etag if weak else etag
+
+
+def feed_cache_context(request, fragment_name, *scopes):
+    """
+    Template context for caching one page of a feed in the fragment.
+    The fragment is the same for every viewer, the edit buttons of the
+    cards are put in place after it is fetched. A cached fragment comes
+    in 'feed_fragment', the view then skips the queries of the page.
+    """
+    versions = get_versions(*scopes)
+    page = [request.GET.get(name, '') for name in ('page', 'after', 'before')]
+    key = ':'.join(str(part) for part in (
+        *scopes, *versions, _freshness(request), *page))
+    fragment = cache.get(make_template_fragment_key(fragment_name, [key]))
+    return {
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'feed_cache_key': key,
+        'feed_fragment': None if fragment is None else mark_safe(fragment),
+    }
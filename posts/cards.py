@@ -0,0 +1,58 @@
+"""
+Cached post cards.
+
+The card of a post is rendered once per post version and kept in the
+cache, so listings are assembled from cards fetched with one get_many
+and only render the posts changed since. Post.version grows with every
+change shown on the card: edits, comments, generated thumbnails and
+renames of its author or group.
+The edit button depends on the viewer, cards keep a marker in its place
+and edit_buttons puts the buttons of the viewer's posts there once the
+cards, or a cached page of them, are assembled.
+"""
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+CARD_KEY = 'post-card:{}:{}'
+
+# Rendered into cached cards instead of the edit button with the ids of
+# the author and the post, see includes/post_item.html.
+EDIT_MARKER = re.compile(r'<!--post-edit-button:(\d+):(\d+)-->')
+
+
+def card_key(post):
+    return CARD_KEY.format(post.pk, post.version)
+
+
+def render_cards(posts):
+    """Return the HTML of the post cards with the edit button markers."""
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    rendered = {}
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            rendered[key] = render_to_string(
+                'includes/post_item.html', {'post': post, 'cached_card': True})
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(rendered)
+    return mark_safe(''.join(cards[key] for key in keys))
+
+
+def place_edit_buttons(html, user):
+    """Replace the markers with the edit buttons of the user's posts."""
+    def button(match):
+        author_id, post_id = map(int, match.groups())
+        if author_id != user.pk:
+            return ''
+        return render_to_string(
+            'includes/post_edit_button.html',
+            {'post': Post(pk=post_id, author=user)})
+    return mark_safe(EDIT_MARKER.sub(button, html))
@@ -0,0 +1,63 @@
+"""
+Denormalized counters.
+
+Counts shown on every page are stored next to the rows they describe
+and changed together with the rows they count, so templates read a
+column instead of running COUNT per author or per post.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserCounters
+
+
+def change_user(user_id, **deltas):
+    """Add deltas to the user counters, creating the row if needed."""
+    update = {field: F(field) + delta for field, delta in deltas.items()}
+    if UserCounters.objects.filter(user_id=user_id).update(**update):
+        return
+    # Only growing counters create the row: decrements come from
+    # deletions, possibly of the user itself.
+    if all(delta > 0 for delta in deltas.values()):
+        UserCounters.objects.get_or_create(user_id=user_id)
+        UserCounters.objects.filter(user_id=user_id).update(**update)
+
+
+def change_post(post_id, delta):
+    """Add delta to the post comment counter, changing its card."""
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + delta, version=F('version') + 1)
+
+
+def _count(queryset, field):
+    subquery = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(subquery), Value(0))
+
+
+def _fix(queryset, name, actual, **changes):
+    return queryset.exclude(**{name: actual}).update(
+        **{name: actual}, **changes)
+
+
+def reconcile():
+    """
+    Recount every counter from the source tables.
+    Return the number of fixed rows per counter.
+    """
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=user_id) for user_id in User.objects.filter(
+            counters__isnull=True).values_list('pk', flat=True)],
+        batch_size=1000)
+    counters = UserCounters.objects.all()
+    return {
+        'posts_count': _fix(
+            counters, 'posts_count', _count(Post.objects, 'author')),
+        'followers_count': _fix(
+            counters, 'followers_count', _count(Follow.objects, 'author')),
+        'following_count': _fix(
+            counters, 'following_count', _count(Follow.objects, 'user')),
+        'comment_count': _fix(
+            Post.objects.all(), 'comment_count',
+            _count(Comment.objects, 'post'), version=F('version') + 1),
+    }
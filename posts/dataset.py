@@ -0,0 +1,280 @@
+"""
+Synthetic dataset for capacity testing.
+
+Authors, followed users, groups and commented posts are drawn from
+power-law distributions, so a few celebrities get most of the followers
+and posts while the rest form a long tail. All objects get explicit
+ids and are written with bulk_create, related ids are taken from the
+ranges generated before, and the same seed always gives the same data.
+"""
+import io
+import random
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from . import cache, timeline
+from .importer import insert_raw, reset_sequences
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+BATCH_SIZE = 1000
+
+# Generation order, later kinds refer to the earlier ones.
+KINDS = ('users', 'groups', 'follows', 'posts', 'comments')
+
+LOOKUP_CHUNK = 500
+
+WORDS = (
+    'город', 'море', 'солнце', 'дорога', 'книга', 'утро', 'вечер', 'кот',
+    'собака', 'друг', 'работа', 'отпуск', 'поезд', 'лес', 'река', 'гора',
+    'кофе', 'музыка', 'фильм', 'снег', 'дождь', 'весна', 'лето', 'осень',
+    'зима', 'сегодня', 'вчера', 'завтра', 'новый', 'старый', 'большой',
+    'маленький', 'красивый', 'быстрый', 'долгий', 'первый', 'последний',
+    'думаю', 'вижу', 'люблю', 'помню', 'пишу', 'читаю', 'гуляю', 'жду',
+    'очень', 'снова', 'опять', 'всегда', 'иногда', 'наконец', 'просто',
+)
+
+IMAGE_SIZE = (960, 540)
+
+# Dates are counted back from here unless another moment is given, so
+# they don't depend on when the data is generated either.
+EPOCH = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+class PowerLaw:
+    """
+    Ranks from 1 to `size` drawn with probability falling as
+    rank ** -alpha, by inverting the continuous distribution, so no
+    table of weights is kept in memory.
+    """
+
+    def __init__(self, size, alpha, rng):
+        self.size = size
+        self.alpha = alpha
+        self.rng = rng
+
+    def rank(self):
+        u = self.rng.random()
+        if abs(self.alpha - 1) < 1e-9:
+            value = (self.size + 1) ** u
+        else:
+            exponent = 1 - self.alpha
+            value = (((self.size + 1) ** exponent - 1) * u + 1) ** (
+                1 / exponent)
+        return max(1, min(int(value), self.size))
+
+    def choice(self, population):
+        return population[self.rank() - 1]
+
+
+def _next_id(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+def _batches(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+class DatasetGenerator:
+    """
+    Generate users, groups, follows, posts and comments, in this order.
+    Every method yields the number of rows written by each batch.
+    """
+
+    def __init__(self, seed=0, alpha=1.2, activity_alpha=1.0, days=365,
+                 image_ratio=0.0, ungrouped_ratio=0.3, prefix='synthetic',
+                 batch_size=BATCH_SIZE, timelines=True, now=EPOCH):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.alpha = alpha
+        self.activity_alpha = activity_alpha
+        self.days = days
+        self.image_ratio = image_ratio
+        self.ungrouped_ratio = ungrouped_ratio
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.timelines = timelines
+        self.now = now
+        self.start = self.now - timedelta(days=days)
+        self.user_ids = None
+        self.group_ids = None
+        self.post_ids = None
+
+    def _pool(self, ids, model):
+        if ids:
+            return ids
+        return list(model.objects.order_by('pk').values_list('pk', flat=True))
+
+    def _text(self, low, high):
+        words = self.rng.choices(WORDS, k=self.rng.randint(low, high))
+        return ' '.join(words).capitalize() + '.'
+
+    def users(self, count):
+        first = _next_id(User)
+        self.user_ids = range(first, first + count)
+        password = make_password(None)
+        for start, size in _batches(count, self.batch_size):
+            users = [
+                User(pk=pk, username=f'{self.prefix}{pk}',
+                     first_name=f'Пользователь {pk}', password=password,
+                     date_joined=self.start)
+                for pk in self.user_ids[start:start + size]]
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                UserCounters.objects.bulk_create(
+                    [UserCounters(user_id=user.pk) for user in users])
+            yield size
+        reset_sequences(User)
+        cache.bump('profiles')
+
+    def groups(self, count):
+        first = _next_id(Group)
+        self.group_ids = range(first, first + count)
+        for start, size in _batches(count, self.batch_size):
+            Group.objects.bulk_create([
+                Group(pk=pk, title=f'Группа {pk}',
+                      slug=f'{self.prefix}-group-{pk}',
+                      description=self._text(5, 20))
+                for pk in self.group_ids[start:start + size]])
+            yield size
+        reset_sequences(Group)
+        cache.bump('groups')
+
+    def follows(self, count):
+        """Followers are uniform, followed authors follow the power law."""
+        user_ids = self._pool(self.user_ids, User)
+        if len(user_ids) < 2:
+            return
+        authors = PowerLaw(len(user_ids), self.alpha, self.rng)
+        for start, size in _batches(count, self.batch_size):
+            follows = []
+            for _ in range(size):
+                user_id = self.rng.choice(user_ids)
+                author_id = authors.choice(user_ids)
+                if user_id != author_id:
+                    follows.append(
+                        Follow(user_id=user_id, author_id=author_id))
+            Follow.objects.bulk_create(follows, ignore_conflicts=True)
+            yield size
+        cache.bump('profiles')
+
+    def _images(self, count=8):
+        """Save a few generated pictures shared by the posts."""
+        names = []
+        for number in range(count):
+            name = f'posts/synthetic/{self.seed}-{number}.jpg'
+            if not default_storage.exists(name):
+                # A separate generator keeps the data the same whether
+                # the pictures exist already or not.
+                rng = random.Random(f'{self.seed}-{number}')
+                image = Image.new('RGB', IMAGE_SIZE, tuple(
+                    rng.randrange(256) for _ in range(3)))
+                draw = ImageDraw.Draw(image)
+                for _ in range(12):
+                    xs = sorted(rng.randrange(IMAGE_SIZE[0])
+                                for _ in range(2))
+                    ys = sorted(rng.randrange(IMAGE_SIZE[1])
+                                for _ in range(2))
+                    draw.ellipse((xs[0], ys[0], xs[1], ys[1]), fill=tuple(
+                        rng.randrange(256) for _ in range(3)))
+                buffer = io.BytesIO()
+                image.save(buffer, 'JPEG', quality=80)
+                name = default_storage.save(name, ContentFile(
+                    buffer.getvalue()))
+            names.append(name)
+        return names
+
+    def posts(self, count):
+        """
+        Authors and groups follow the power law; dates grow with ids
+        over the configured period, the way real posts are added.
+        """
+        user_ids = list(self._pool(self.user_ids, User))
+        group_ids = self._pool(self.group_ids, Group)
+        if not user_ids:
+            return
+        # The most active authors are not the most followed ones,
+        # otherwise celebrities would fan out most of the posts.
+        self.rng.shuffle(user_ids)
+        authors = PowerLaw(len(user_ids), self.activity_alpha, self.rng)
+        groups = PowerLaw(len(group_ids), self.alpha, self.rng)
+        images = self._images() if self.image_ratio else []
+        span = (self.now - self.start) / max(count, 1)
+        first = _next_id(Post)
+        self.post_ids = range(first, first + count)
+        scopes = set()
+        for start, size in _batches(count, self.batch_size):
+            posts = []
+            for number in range(start, start + size):
+                group_id = None
+                if group_ids and self.rng.random() >= self.ungrouped_ratio:
+                    group_id = groups.choice(group_ids)
+                image = None
+                if images and self.rng.random() < self.image_ratio:
+                    image = self.rng.choice(images)
+                posts.append(Post(
+                    pk=first + number,
+                    text=self._text(5, 60),
+                    author_id=authors.choice(user_ids),
+                    group_id=group_id,
+                    image=image,
+                    pub_date=self.start + span * (
+                        number + self.rng.random()),
+                ))
+            with transaction.atomic():
+                insert_raw(Post, posts)
+                if self.timelines:
+                    timeline.fan_out_many(posts)
+            for post in posts:
+                scopes.update(
+                    cache.post_scopes(post.author_id, post.group_id))
+            yield size
+        reset_sequences(Post)
+        # Feeds are invalidated once, every bump costs a cache write.
+        cache.bump(*scopes)
+
+    def comments(self, count):
+        """The newest posts are the most commented ones."""
+        user_ids = self._pool(self.user_ids, User)
+        post_ids = self._pool(self.post_ids, Post)
+        if not user_ids or not post_ids:
+            return
+        ranked_posts = post_ids[::-1]
+        popular = PowerLaw(len(ranked_posts), self.alpha, self.rng)
+        first = _next_id(Comment)
+        scopes = set()
+        for start, size in _batches(count, self.batch_size):
+            comments = []
+            chosen = [popular.choice(ranked_posts) for _ in range(size)]
+            posts = {}
+            unique = sorted(set(chosen))
+            # Chunks keep the lookups under the SQLite parameter limit.
+            for offset in range(0, len(unique), LOOKUP_CHUNK):
+                posts.update(
+                    (pk, rest) for pk, *rest in Post.objects.filter(
+                        pk__in=unique[offset:offset + LOOKUP_CHUNK]
+                    ).values_list('pk', 'pub_date', 'author_id', 'group_id'))
+            for number, post_id in enumerate(chosen, first + start):
+                created = posts[post_id][0] + timedelta(
+                    hours=self.rng.expovariate(1 / 24))
+                comments.append(Comment(
+                    pk=number,
+                    post_id=post_id,
+                    author_id=self.rng.choice(user_ids),
+                    text=self._text(2, 20),
+                    created=min(created, self.now),
+                ))
+            with transaction.atomic():
+                insert_raw(Comment, comments)
+            for pub_date, author_id, group_id in posts.values():
+                scopes.update(cache.post_scopes(author_id, group_id))
+            yield size
+        reset_sequences(Comment)
+        cache.bump(*scopes)
@@ -0,0 +1,121 @@
+"""
+Export of a user's data as a zip archive.
+
+The archive is written into an unseekable stream whose chunks are
+yielded as soon as they are compressed, and posts and comments are read
+with .iterator(), so memory use doesn't depend on how much the user
+has published. The same generator feeds the download view and the
+export_user_data command.
+"""
+import json
+import logging
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Rows fetched from the database at a time.
+ITERATOR_CHUNK_SIZE = 500
+
+
+class _ChunkWriter:
+    """Write-only file object collecting what zipfile writes."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _image_name(name):
+    return f'images/{name}'
+
+
+def _post_data(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'group': post.group.slug if post.group_id else None,
+        'image': _image_name(post.image.name) if post.image else None,
+        'comment_count': post.comment_count,
+    }
+
+
+def _comment_data(comment):
+    return {
+        'id': comment.pk,
+        'post': comment.post_id,
+        'text': comment.text,
+        'created': comment.created,
+    }
+
+
+def _json_array(archive, writer, name, objects):
+    """Write the objects as a JSON array entry, yielding the output."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False, indent=2)
+    # Entry sizes are unknown in advance, zip64 lets them exceed 2 GiB.
+    with archive.open(name, 'w', force_zip64=True) as entry:
+        separator = '[\n'
+        for data in objects:
+            entry.write((separator + encoder.encode(data)).encode())
+            separator = ',\n'
+            yield writer.pop()
+        entry.write(('[]' if separator == '[\n' else '\n]').encode())
+    yield writer.pop()
+
+
+def _copy_file(archive, writer, name):
+    try:
+        source = default_storage.open(name)
+    except OSError:
+        logger.warning('Image %s is missing, not exported', name)
+        return
+    with source, archive.open(
+            _image_name(name), 'w', force_zip64=True) as entry:
+        for chunk in source.chunks(CHUNK_SIZE):
+            entry.write(chunk)
+            yield writer.pop()
+    yield writer.pop()
+
+
+def iter_export(user):
+    """Yield the bytes of the zip archive with the user's data."""
+    writer = _ChunkWriter()
+    posts = user.posts.select_related('group').order_by('pk')
+    comments = user.comments.order_by('pk')
+    with zipfile.ZipFile(writer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        profile = {
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'email': user.email,
+            'date_joined': user.date_joined,
+        }
+        archive.writestr('profile.json', json.dumps(
+            profile, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
+        yield from _json_array(
+            archive, writer, 'posts.json',
+            map(_post_data, posts.iterator(ITERATOR_CHUNK_SIZE)))
+        yield from _json_array(
+            archive, writer, 'comments.json',
+            map(_comment_data, comments.iterator(ITERATOR_CHUNK_SIZE)))
+        images = posts.exclude(image='').exclude(
+            image__isnull=True).values_list('image', flat=True).distinct()
+        for name in images.iterator(ITERATOR_CHUNK_SIZE):
+            yield from _copy_file(archive, writer, name)
+    yield writer.pop()
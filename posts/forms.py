@@ -1,6 +1,8 @@
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
 from .models import Comment, Post
+from .uploads import normalize_image
 
 
 class PostForm(ModelForm):
@@ -8,6 +10,24 @@ class PostForm(ModelForm):
         model = Post
         fields = ['group', 'text', 'image']
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return normalize_image(image)
+        return image
+
+    def save(self, commit=True):
+        """
+        Save the post and close the stored image file: the request only
+        closes its own uploads, not the downscaled copy.
+        """
+        try:
+            return super().save(commit)
+        finally:
+            image = self.cleaned_data.get('image')
+            if commit and isinstance(image, UploadedFile):
+                image.close()
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,262 @@
+"""
+In-memory follow graph.
+
+Follow edges are kept as two CSR (compressed sparse row) structures of
+int32 arrays: the authors followed by each user and the followers of
+each author, every row sorted. A row is a slice of one flat array found
+through an offsets array indexed by user id, so 10M edges take about
+80 MB and membership checks are binary searches. Follows made in this
+process are applied on commit to small per-user overlay sets; the
+graph is loaded from the database by a background thread on first use
+and reloaded every FOLLOW_GRAPH_MAX_AGE seconds, which also brings in
+the follows made by other processes. Until the first load is done
+there is no graph and no suggestions.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max
+
+from .models import Follow, User
+
+# Followed authors of each followed author looked at for suggestions,
+# celebrities following thousands would make them slow.
+SUGGESTION_FANOUT = 200
+
+# Most followed users offered to users whose follows suggest nothing.
+POPULAR_SIZE = 100
+
+
+def _zeros(length):
+    return array('i', bytes(4 * length))
+
+
+def _rows(edges, size):
+    """
+    Offsets and targets of rows built from (row, target) pairs sorted
+    by row, with at least size rows and a row for every target.
+    """
+    counts = _zeros(size + 1)
+    targets = array('i')
+    for row, target in edges:
+        if row + 1 >= len(counts):
+            counts.extend(_zeros(row + 2 - len(counts)))
+        counts[row + 1] += 1
+        targets.append(target)
+    if targets and max(targets) + 2 > len(counts):
+        counts.extend(_zeros(max(targets) + 2 - len(counts)))
+    for row in range(len(counts) - 1):
+        counts[row + 1] += counts[row]
+    return counts, targets
+
+
+class FollowGraph:
+    def __init__(self, edges=(), size=0):
+        """
+        Build the graph from (user id, author id) pairs sorted by both,
+        size is the expected number of user ids.
+        """
+        self._out_offsets, self._out = _rows(edges, size)
+        self.size = len(self._out_offsets) - 1
+        # Counting sort by author keeps the followers of each author
+        # sorted, as the edges come sorted by user.
+        in_counts = _zeros(self.size + 1)
+        for author in self._out:
+            in_counts[author + 1] += 1
+        for row in range(self.size):
+            in_counts[row + 1] += in_counts[row]
+        self._in_offsets = in_counts
+        self._in = _zeros(len(self._out))
+        position = array('i', in_counts[:-1])
+        for user in range(self.size):
+            for index in range(self._out_offsets[user],
+                               self._out_offsets[user + 1]):
+                author = self._out[index]
+                self._in[position[author]] = user
+                position[author] += 1
+        self._added = ({}, {})
+        self._removed = ({}, {})
+        self._popular = sorted(
+            range(self.size), key=self._base_followers_count,
+            reverse=True)[:POPULAR_SIZE]
+
+    def _base_followers_count(self, user_id):
+        return self._in_offsets[user_id + 1] - self._in_offsets[user_id]
+
+    def _base(self, side, user_id):
+        offsets, targets = (
+            (self._out_offsets, self._out), (self._in_offsets, self._in)
+        )[side]
+        if user_id >= self.size:
+            return targets, 0, 0
+        return targets, offsets[user_id], offsets[user_id + 1]
+
+    def _has(self, side, user_id, other_id):
+        if other_id in self._added[side].get(user_id, ()):
+            return True
+        if other_id in self._removed[side].get(user_id, ()):
+            return False
+        targets, start, end = self._base(side, user_id)
+        index = bisect_left(targets, other_id, start, end)
+        return index < end and targets[index] == other_id
+
+    def _row(self, side, user_id):
+        targets, start, end = self._base(side, user_id)
+        removed = self._removed[side].get(user_id, ())
+        row = [target for target in targets[start:end]
+               if target not in removed]
+        return row + sorted(self._added[side].get(user_id, ()))
+
+    def _count(self, side, user_id):
+        targets, start, end = self._base(side, user_id)
+        return (end - start - len(self._removed[side].get(user_id, ()))
+                + len(self._added[side].get(user_id, ())))
+
+    def _change(self, side, user_id, other_id, following):
+        targets, start, end = self._base(side, user_id)
+        index = bisect_left(targets, other_id, start, end)
+        in_base = index < end and targets[index] == other_id
+        added = self._added[side].setdefault(user_id, set())
+        removed = self._removed[side].setdefault(user_id, set())
+        if following:
+            removed.discard(other_id)
+            if not in_base:
+                added.add(other_id)
+        else:
+            added.discard(other_id)
+            if in_base:
+                removed.add(other_id)
+
+    def change(self, user_id, author_id, following):
+        """Apply a follow (following=True) or an unfollow."""
+        self._change(0, user_id, author_id, following)
+        self._change(1, author_id, user_id, following)
+
+    def follows(self, user_id, author_id):
+        return self._has(0, user_id, author_id)
+
+    def is_mutual(self, user_id, other_id):
+        return (self._has(0, user_id, other_id)
+                and self._has(0, other_id, user_id))
+
+    def following(self, user_id):
+        return self._row(0, user_id)
+
+    def followers(self, user_id):
+        return self._row(1, user_id)
+
+    def following_count(self, user_id):
+        return self._count(0, user_id)
+
+    def followers_count(self, user_id):
+        return self._count(1, user_id)
+
+    def suggestions(self, user_id, limit):
+        """
+        Users to follow: the ones most followed by the authors the user
+        follows, then the most followed users.
+        """
+        followed = set(self.following(user_id))
+        followed.add(user_id)
+        scores = Counter()
+        for friend in followed - {user_id}:
+            for candidate in self.following(friend)[:SUGGESTION_FANOUT]:
+                if candidate not in followed:
+                    scores[candidate] += 1
+        ranked = sorted(scores, key=lambda candidate: (
+            -scores[candidate], -self.followers_count(candidate),
+            candidate))
+        ranked += [candidate for candidate in self._popular
+                   if candidate not in followed and candidate not in scores
+                   and self.followers_count(candidate)]
+        return ranked[:limit]
+
+
+_lock = threading.Lock()
+_graph = None
+_loaded_at = 0.0
+# Changes made while a reload reads the database, replayed on the new
+# graph, or None when no reload runs.
+_journal = None
+
+
+def load():
+    """Read every follow edge from the database into a new graph."""
+    size = (User.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    edges = Follow.objects.order_by('user_id', 'author_id').values_list(
+        'user_id', 'author_id')
+    return FollowGraph(edges.iterator(), size)
+
+
+def reload():
+    """
+    Read the graph from the database in this thread and swap it in,
+    follows committed meanwhile are replayed on it.
+    """
+    global _graph, _loaded_at, _journal
+    with _lock:
+        if _journal is None:
+            _journal = []
+    graph = None
+    try:
+        graph = load()
+    finally:
+        with _lock:
+            if graph is not None:
+                for change in _journal:
+                    graph.change(*change)
+                _graph = graph
+            # A failed reload is retried after the next max age, a failed
+            # first load on the next use.
+            _loaded_at, _journal = time.monotonic(), None
+
+
+def _reload_in_background():
+    try:
+        reload()
+    finally:
+        # Nobody else would close the connections of this thread.
+        connections.close_all()
+
+
+def get_graph():
+    """
+    The graph of this process, or None until it is first loaded.
+    Loads and reloads run in a background thread, requests keep
+    using the graph they find meanwhile.
+    """
+    global _journal
+    with _lock:
+        if (_journal is None and settings.FOLLOW_GRAPH_AUTOLOAD
+                and (_graph is None or time.monotonic() - _loaded_at
+                     > settings.FOLLOW_GRAPH_MAX_AGE)):
+            _journal = []
+            threading.Thread(
+                target=_reload_in_background, daemon=True).start()
+        return _graph
+
+
+def _apply(user_id, author_id, following):
+    with _lock:
+        if _graph is not None:
+            _graph.change(user_id, author_id, following)
+        if _journal is not None:
+            _journal.append((user_id, author_id, following))
+
+
+def record(user_id, author_id, following):
+    """Apply a follow or an unfollow to the graph after the commit."""
+    transaction.on_commit(
+        lambda: _apply(user_id, author_id, following))
+
+
+def reset():
+    """Forget the graph, the next use loads it again."""
+    global _graph
+    with _lock:
+        _graph = None
@@ -0,0 +1,485 @@
+"""
+Bulk import of users, groups, posts, comments and follows.
+
+Rows are streamed from JSONL or CSV, validated and written with
+bulk inserts, one transaction per batch, so the memory used doesn't
+depend on the size of the input. Usernames and group slugs are resolved
+to ids through bounded in-memory maps. Counters, timelines, feed caches
+and the follow graph are updated in the transaction of every batch, the
+way the signals do it for single saves, so an interrupted import leaves
+them matching the imported rows.
+"""
+import csv
+import json
+from collections import Counter, OrderedDict
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.core.validators import validate_slug
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache, counters, graph, timeline
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+BATCH_SIZE = 500
+
+# Most keys kept by a KeyMap, the least recently used are dropped.
+MAP_SIZE = 100000
+
+# Keep lists for `__in` lookups under the SQLite parameter limit.
+LOOKUP_CHUNK = 500
+
+
+class RowError(ValueError):
+    """Row can't be imported."""
+
+
+def read_rows(stream, input_format):
+    """Yield rows of the stream: dicts for CSV, lines for JSONL."""
+    if input_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield line
+
+
+def _as_dict(row):
+    if isinstance(row, dict):
+        return row
+    try:
+        row = json.loads(row)
+    except ValueError as error:
+        raise RowError(f'invalid JSON: {error}')
+    if not isinstance(row, dict):
+        raise RowError('a JSON object is expected')
+    return row
+
+
+def _chunks(values, size=LOOKUP_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class KeyMap:
+    """Bounded map of natural keys to primary keys, loaded in batches."""
+
+    def __init__(self, queryset, field, size=MAP_SIZE):
+        self.queryset = queryset
+        self.field = field
+        self.size = size
+        self._ids = OrderedDict()
+
+    def load(self, keys):
+        """Fetch the ids of the keys not in the map with few queries."""
+        missing = {key for key in keys if key and key not in self._ids}
+        for chunk in _chunks(missing):
+            self._ids.update(self.queryset.filter(
+                **{f'{self.field}__in': chunk}).values_list(self.field, 'pk'))
+        while len(self._ids) > self.size:
+            self._ids.popitem(last=False)
+
+    def get(self, key):
+        pk = self._ids.get(key)
+        if pk is not None:
+            self._ids.move_to_end(key)
+        return pk
+
+
+def _text(row, name, max_length=None, required=True):
+    value = row.get(name)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'{name} is required')
+    if max_length is not None and len(value) > max_length:
+        raise RowError(f'{name} is longer than {max_length} characters')
+    return value
+
+
+def _id(row, name='id', required=False):
+    value = row.get(name)
+    if value in (None, ''):
+        if required:
+            raise RowError(f'{name} is required')
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{name} must be an integer')
+    if value <= 0:
+        raise RowError(f'{name} must be positive')
+    return value
+
+
+def _date(row, name):
+    value = row.get(name)
+    if not value:
+        return timezone.now()
+    try:
+        date = parse_datetime(str(value))
+    except ValueError:
+        date = None
+    if date is None:
+        raise RowError(f'{name} must be an ISO 8601 date and time')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def insert_raw(model, objects):
+    """
+    Insert the objects with the values they have, the way loaddata
+    does: bulk_create would replace the imported dates of auto_now_add
+    fields with the current time. No signals are sent.
+    """
+    fields = model._meta.concrete_fields
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)))
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(getattr(obj, field.attname), connection)
+             for field in fields]
+            for obj in objects])
+
+
+def take_write_lock(model):
+    """
+    Take the database write lock in the current transaction: no other
+    writer can store the ids allocated from the last one or the rows
+    found missing until the batch commits. SQLite takes the lock on the
+    first write statement of a transaction, even one changing no rows.
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute('UPDATE {0} SET {1} = {1} WHERE 0'.format(
+            quote(model._meta.db_table), quote(model._meta.pk.column)))
+
+
+def reset_sequences(*models):
+    """
+    Move the id sequences past the explicitly given ids, the way
+    loaddata does; SQLite has no sequences to reset.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+class Importer:
+    """
+    Base importer of one kind of rows.
+
+    `build` turns a row into an unsaved object or raises RowError,
+    `unique` names the field whose existing values make rows skipped,
+    so batches imported before are not imported twice.
+    """
+    model = None
+    unique = 'pk'
+
+    def __init__(self):
+        self.users = KeyMap(User.objects.all(), 'username')
+        self.groups = KeyMap(Group.objects.all(), 'slug')
+
+    def prepare(self, rows):
+        """Load what the batch refers to before building its objects."""
+
+    def build(self, row):
+        raise NotImplementedError
+
+    def save(self, objects):
+        self.model.objects.bulk_create(objects)
+
+    def after_save(self, objects):
+        """Update what the signals would update for single saves."""
+
+    def new_objects(self, objects):
+        """Objects not stored yet, see `unique`."""
+        seen = self.existing(objects)
+        new = []
+        for obj in objects:
+            value = getattr(obj, self.unique)
+            if value is None or value not in seen:
+                new.append(obj)
+                if value is not None:
+                    seen.add(value)
+        return new
+
+    def _user(self, row, name):
+        username = _text(row, name)
+        user_id = self.users.get(username)
+        if user_id is None:
+            raise RowError(f'unknown user {username}')
+        return user_id
+
+    def existing(self, objects):
+        """Values of the unique field already stored."""
+        values = [getattr(obj, self.unique) for obj in objects]
+        found = set()
+        for chunk in _chunks(value for value in values if value is not None):
+            found.update(self.model.objects.filter(
+                **{f'{self.unique}__in': chunk}).values_list(
+                self.unique, flat=True))
+        return found
+
+    def allocate_ids(self, objects):
+        """Give ids to the objects that have none."""
+        new = [obj for obj in objects if obj.pk is None]
+        if not new:
+            return
+        last = self.model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        for number, obj in enumerate(new, last + 1):
+            obj.pk = number
+
+
+class UserImporter(Importer):
+    model = User
+    unique = 'username'
+
+    def build(self, row):
+        username = _text(row, 'username', 150)
+        try:
+            User.username_validator(username)
+        except ValidationError:
+            raise RowError(f'invalid username {username}')
+        return User(
+            pk=_id(row),
+            username=username,
+            first_name=_text(row, 'first_name', 30, required=False),
+            last_name=_text(row, 'last_name', 150, required=False),
+            email=_text(row, 'email', 254, required=False),
+            password=make_password(None),
+            date_joined=_date(row, 'date_joined'),
+        )
+
+    def after_save(self, objects):
+        UserCounters.objects.bulk_create(
+            [UserCounters(user_id=user.pk) for user in objects])
+        cache.bump('profiles')
+
+
+class GroupImporter(Importer):
+    model = Group
+    unique = 'slug'
+
+    def build(self, row):
+        slug = _text(row, 'slug', 50)
+        try:
+            validate_slug(slug)
+        except ValidationError:
+            raise RowError(f'invalid slug {slug}')
+        return Group(
+            pk=_id(row),
+            title=_text(row, 'title', 200),
+            slug=slug,
+            description=_text(row, 'description', required=False),
+        )
+
+    def after_save(self, objects):
+        cache.bump('groups')
+
+
+class PostImporter(Importer):
+    model = Post
+
+    def prepare(self, rows):
+        self.users.load(row.get('author') for row in rows)
+        self.groups.load(row.get('group') for row in rows)
+
+    def build(self, row):
+        group_id = None
+        slug = _text(row, 'group', required=False)
+        if slug:
+            group_id = self.groups.get(slug)
+            if group_id is None:
+                raise RowError(f'unknown group {slug}')
+        return Post(
+            pk=_id(row),
+            text=_text(row, 'text'),
+            author_id=self._user(row, 'author'),
+            group_id=group_id,
+            pub_date=_date(row, 'pub_date'),
+            image=_text(row, 'image', 100, required=False) or None,
+        )
+
+    def save(self, objects):
+        insert_raw(Post, objects)
+
+    def after_save(self, objects):
+        timeline.fan_out_many(objects)
+        posts = Counter(post.author_id for post in objects)
+        for author_id, count in posts.items():
+            counters.change_user(author_id, posts_count=count)
+        scopes = set()
+        for post in objects:
+            scopes.update(cache.post_scopes(post.author_id, post.group_id))
+        cache.bump(*scopes)
+
+
+class CommentImporter(Importer):
+    model = Comment
+
+    def prepare(self, rows):
+        self.users.load(row.get('author') for row in rows)
+        post_ids = set()
+        for row in rows:
+            try:
+                post_ids.add(_id(row, 'post', required=True))
+            except RowError:
+                pass
+        self.posts = {}
+        for chunk in _chunks(post_ids):
+            self.posts.update(
+                (pk, (author_id, group_id))
+                for pk, author_id, group_id in Post.objects.filter(
+                    pk__in=chunk).values_list('pk', 'author_id', 'group_id'))
+
+    def build(self, row):
+        post_id = _id(row, 'post', required=True)
+        if post_id not in self.posts:
+            raise RowError(f'unknown post {post_id}')
+        return Comment(
+            pk=_id(row),
+            post_id=post_id,
+            author_id=self._user(row, 'author'),
+            text=_text(row, 'text'),
+            created=_date(row, 'created'),
+        )
+
+    def save(self, objects):
+        insert_raw(Comment, objects)
+
+    def after_save(self, objects):
+        comments = Counter(comment.post_id for comment in objects)
+        for post_id, count in comments.items():
+            counters.change_post(post_id, count)
+        scopes = set()
+        for comment in objects:
+            scopes.update(cache.post_scopes(*self.posts[comment.post_id]))
+        cache.bump(*scopes)
+
+
+class FollowImporter(Importer):
+    model = Follow
+    unique = None
+
+    def prepare(self, rows):
+        self.users.load(
+            row.get(name) for row in rows for name in ('user', 'author'))
+
+    def build(self, row):
+        follow = Follow(
+            user_id=self._user(row, 'user'),
+            author_id=self._user(row, 'author'))
+        if follow.user_id == follow.author_id:
+            raise RowError('users can not follow themselves')
+        return follow
+
+    def allocate_ids(self, objects):
+        pass
+
+    def new_objects(self, objects):
+        pairs = {(follow.user_id, follow.author_id) for follow in objects}
+        stored = set()
+        for chunk in _chunks(pairs):
+            stored.update(Follow.objects.filter(
+                user_id__in={user_id for user_id, _ in chunk},
+                author_id__in={author_id for _, author_id in chunk},
+            ).values_list('user_id', 'author_id'))
+        new = []
+        for follow in objects:
+            pair = (follow.user_id, follow.author_id)
+            if pair not in stored:
+                new.append(follow)
+                stored.add(pair)
+        return new
+
+    def after_save(self, objects):
+        following = Counter(follow.user_id for follow in objects)
+        followers = Counter(follow.author_id for follow in objects)
+        for user_id, count in following.items():
+            counters.change_user(user_id, following_count=count)
+        for author_id, count in followers.items():
+            counters.change_user(author_id, followers_count=count)
+        for follow in objects:
+            timeline.backfill(follow.user_id, follow.author_id)
+            graph.record(follow.user_id, follow.author_id, True)
+        cache.bump('profiles', *{
+            f'author:{user_id}' for follow in objects
+            for user_id in (follow.user_id, follow.author_id)})
+
+
+IMPORTERS = {
+    'users': UserImporter,
+    'groups': GroupImporter,
+    'posts': PostImporter,
+    'comments': CommentImporter,
+    'follows': FollowImporter,
+}
+
+
+class BatchResult:
+    def __init__(self, rows):
+        self.rows = rows
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+
+
+def import_batch(importer, numbered_rows):
+    """
+    Validate and write one batch of (row number, row) pairs
+    in a single transaction.
+    """
+    result = BatchResult(len(numbered_rows))
+    parsed = []
+    for number, row in numbered_rows:
+        try:
+            parsed.append((number, _as_dict(row)))
+        except RowError as error:
+            result.errors.append((number, str(error)))
+    importer.prepare([row for number, row in parsed])
+    objects = []
+    for number, row in parsed:
+        try:
+            objects.append(importer.build(row))
+        except RowError as error:
+            result.errors.append((number, str(error)))
+    with transaction.atomic():
+        take_write_lock(importer.model)
+        new = importer.new_objects(objects)
+        result.skipped = len(objects) - len(new)
+        objects = new
+        importer.allocate_ids(objects)
+        importer.save(objects)
+        importer.after_save(objects)
+    result.created = len(objects)
+    return result
+
+
+def import_rows(kind, rows, start=0, batch_size=BATCH_SIZE):
+    """
+    Import the rows of the kind after the first `start` ones,
+    yielding a BatchResult for every committed batch.
+    """
+    importer = IMPORTERS[kind]()
+    batch = []
+    for number, row in enumerate(rows, 1):
+        if number <= start:
+            continue
+        batch.append((number, row))
+        if len(batch) >= batch_size:
+            yield import_batch(importer, batch)
+            batch = []
+    if batch:
+        yield import_batch(importer, batch)
+    reset_sequences(importer.model)
@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmark, counters, dataset
+
+# Database settings replaced by each profile, 'tuned' keeps the
+# configured ones.
+PROFILES = {
+    'default': {'OPTIONS': {}, 'CONN_MAX_AGE': 0},
+    'tuned': {},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure read and write throughput of the posts views with '
+        'concurrent writer and reader processes on a generated SQLite '
+        'database, with the default and the configured connection '
+        'settings.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--follows', type=int, default=2000)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument(
+            '--profile', choices=(*PROFILES, 'both'), default='both')
+
+    def handle(self, **options):
+        if connection.vendor != 'sqlite':
+            self.stderr.write('The benchmark is meant for SQLite.')
+        profiles = (
+            PROFILES if options['profile'] == 'both'
+            else [options['profile']])
+        # DEBUG would turn on the debug toolbar and the query log.
+        setup_test_environment(debug=False)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for profile in profiles:
+                    results = self.run_profile(profile, directory, options)
+                    for role, metrics in results.items():
+                        self.stdout.write(
+                            f'{profile:<10}{role:<8}'
+                            f'{metrics["per_second"]:>10.1f} req/s'
+                            f'{metrics["errors"]:>6} errors'
+                            f'{metrics["p50_ms"]:>10.2f} ms p50'
+                            f'{metrics["p95_ms"]:>10.2f} ms p95')
+        finally:
+            teardown_test_environment()
+
+    def run_profile(self, profile, directory, options):
+        settings_dict = connection.settings_dict
+        changed = {**PROFILES[profile], 'TEST': {
+            **settings_dict['TEST'],
+            # Forked processes can't share an in-memory database.
+            'NAME': os.path.join(directory, f'{profile}.sqlite3'),
+        }}
+        saved = {key: settings_dict[key] for key in changed}
+        settings_dict.update(changed)
+        old_name = settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f'{profile}: generating the dataset...')
+            generator = dataset.DatasetGenerator(seed=options['seed'])
+            for kind in dataset.KINDS:
+                if options[kind]:
+                    sum(getattr(generator, kind)(options[kind]))
+            with transaction.atomic():
+                counters.reconcile()
+            # The database is measured, not the admission control.
+            with override_settings(WRITE_RATE_LIMITS={}):
+                return benchmark.run_concurrent(
+                    options['writers'], options['readers'],
+                    options['seconds'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            settings_dict.update(saved)
@@ -0,0 +1,98 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmark, counters, dataset
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'views.json')
+
+DATASET_OPTIONS = ('users', 'groups', 'follows', 'posts', 'comments', 'seed')
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the posts views on a generated dataset in a test '
+        'database and compare time, queries and peak memory with the '
+        'stored baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Store the results as the new baseline.')
+        parser.add_argument(
+            '--time-threshold', type=float, default=0.5,
+            help='Allowed share of wall time growth.')
+        parser.add_argument(
+            '--memory-threshold', type=float, default=0.25,
+            help='Allowed share of peak memory growth.')
+
+    def handle(self, **options):
+        data = {name: options[name] for name in DATASET_OPTIONS}
+        # DEBUG would turn on the debug toolbar and the query log.
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write('Generating the dataset...')
+            generator = dataset.DatasetGenerator(seed=data['seed'])
+            for kind in dataset.KINDS:
+                if data[kind]:
+                    sum(getattr(generator, kind)(data[kind]))
+            with transaction.atomic():
+                counters.reconcile()
+            # The writes are measured, not the admission control.
+            with override_settings(WRITE_RATE_LIMITS={}):
+                results = benchmark.run(options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:<20}{metrics["time_ms"]:>10.2f} ms'
+                f'{metrics["queries"]:>6} queries'
+                f'{metrics["peak_kb"]:>10} KiB')
+        if options['update_baseline']:
+            self.write_baseline(options['baseline'], data, results)
+            return
+        self.check_baseline(options, data, results)
+
+    def write_baseline(self, path, data, results):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump({'dataset': data, 'views': results}, file, indent=2)
+            file.write('\n')
+        self.stdout.write(f'Baseline written to {path}')
+
+    def check_baseline(self, options, data, results):
+        path = options['baseline']
+        if not os.path.exists(path):
+            raise CommandError(
+                f'No baseline at {path}, run with --update-baseline')
+        with open(path) as file:
+            baseline = json.load(file)
+        if baseline['dataset'] != data:
+            raise CommandError(
+                'The baseline was measured on another dataset: '
+                f'{baseline["dataset"]}')
+        regressions = benchmark.compare(
+            results, baseline['views'],
+            time_threshold=options['time_threshold'],
+            memory_threshold=options['memory_threshold'])
+        if regressions:
+            raise CommandError(
+                'Regressions against the baseline:\n'
+                + '\n'.join(regressions))
+        self.stdout.write('No regressions against the baseline')
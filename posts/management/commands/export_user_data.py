@@ -0,0 +1,34 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Write posts, comments and images of a user to a zip archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path', help='Output file, "-" for stdout.')
+
+    def handle(self, username, path, **options):
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'User {username} does not exist')
+        output = (sys.stdout.buffer if path == '-'
+                  else open(path, 'wb'))
+        size = 0
+        try:
+            for chunk in export.iter_export(user):
+                output.write(chunk)
+                size += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        if path != '-':
+            self.stdout.write(f'Written {size} bytes to {path}')
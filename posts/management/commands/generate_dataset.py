@@ -0,0 +1,86 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from posts import counters, dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic dataset of users, groups, follows, posts '
+        'and comments with power-law distributions for capacity tests.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help='Power-law exponent of followers per user, posts per '
+                 'group and comments per post; bigger values make the '
+                 'top ones more dominant.')
+        parser.add_argument(
+            '--activity-alpha', type=float, default=1.0,
+            help='Power-law exponent of the number of posts per author.')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='The same seed generates the same data.')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Period the post dates are spread over.')
+        parser.add_argument(
+            '--now', default=dataset.EPOCH.isoformat(),
+            help='Moment the dates lead up to, an ISO 8601 date and time '
+                 'with the time zone.')
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.0,
+            help='Share of posts with a synthetic image.')
+        parser.add_argument(
+            '--ungrouped-ratio', type=float, default=0.3,
+            help='Share of posts without a group.')
+        parser.add_argument('--prefix', default='synthetic')
+        parser.add_argument(
+            '--batch-size', type=int, default=dataset.BATCH_SIZE)
+        parser.add_argument(
+            '--skip-timelines', action='store_true',
+            help='Do not fan posts out to the follow timelines.')
+
+    def handle(self, **options):
+        try:
+            now = parse_datetime(options['now'])
+        except ValueError:
+            now = None
+        if now is None or now.tzinfo is None:
+            raise CommandError(f'Invalid --now: {options["now"]}')
+        generator = dataset.DatasetGenerator(
+            seed=options['seed'],
+            alpha=options['alpha'],
+            activity_alpha=options['activity_alpha'],
+            days=options['days'],
+            image_ratio=options['image_ratio'],
+            ungrouped_ratio=options['ungrouped_ratio'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            timelines=not options['skip_timelines'],
+            now=now,
+        )
+        for kind in dataset.KINDS:
+            count = options[kind]
+            if not count:
+                continue
+            started = time.monotonic()
+            rows = sum(getattr(generator, kind)(count))
+            elapsed = time.monotonic() - started
+            rate = rows / elapsed if elapsed else 0
+            self.stdout.write(
+                f'{kind}: {rows} rows in {elapsed:.1f} s, {rate:.0f} rows/s')
+        with transaction.atomic():
+            counters.reconcile()
+        self.stdout.write('Counters reconciled')
+        if options['image_ratio']:
+            self.stdout.write(
+                'Run generate_thumbnails to prepare the post images')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Generate missing thumbnails and variants of all post images.'
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').exclude(
+            image__isnull=True).values_list('image', 'pk')
+        total = 0
+        for name, post_id in images.iterator():
+            thumbnails.generate(name, post_id)
+            total += 1
+        self.stdout.write(f'Processed {total} images')
@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Import users, groups, posts, comments or follows from a JSONL '
+        'or CSV file in batches. Rows are objects with the model fields; '
+        'authors, users and groups are given by username and slug.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(importer.IMPORTERS))
+        parser.add_argument('path', help='Input file, "-" for stdin.')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Input format, guessed from the file extension by default.')
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.BATCH_SIZE)
+        parser.add_argument(
+            '--checkpoint',
+            help='File keeping the number of imported rows; an interrupted '
+                 'import started again with it continues where it stopped.')
+        parser.add_argument(
+            '--progress-every', type=float, default=5.0,
+            help='Seconds between progress reports.')
+
+    def handle(self, kind, path, **options):
+        input_format = options['format']
+        if input_format is None:
+            input_format = 'csv' if path.endswith('.csv') else 'jsonl'
+        checkpoint = options['checkpoint']
+        source = path if path == '-' else os.path.abspath(path)
+        start = self.read_checkpoint(checkpoint, source)
+        if start:
+            self.stdout.write(f'Resuming after row {start}')
+        stream = (sys.stdin if path == '-'
+                  else open(path, encoding='utf-8', newline=''))
+        rows = start
+        created = skipped = failed = 0
+        started = reported = time.monotonic()
+        try:
+            for result in importer.import_rows(
+                    kind, importer.read_rows(stream, input_format),
+                    start, options['batch_size']):
+                rows += result.rows
+                created += result.created
+                skipped += result.skipped
+                failed += len(result.errors)
+                for number, message in result.errors:
+                    self.stderr.write(f'Row {number}: {message}')
+                self.write_checkpoint(checkpoint, source, rows)
+                now = time.monotonic()
+                if now - reported >= options['progress_every']:
+                    reported = now
+                    self.report(rows - start, now - started, rows)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = time.monotonic() - started
+        self.report(rows - start, elapsed, rows)
+        self.stdout.write(
+            f'Created {created}, skipped {skipped} existing, '
+            f'rejected {failed}')
+
+    def report(self, rows, seconds, total):
+        rate = rows / seconds if seconds else 0
+        self.stdout.write(
+            f'{total} rows processed, {rate:.0f} rows/s')
+
+    def read_checkpoint(self, checkpoint, source):
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as file:
+            state = json.load(file)
+        if state.get('source') != source:
+            raise CommandError(
+                f'Checkpoint {checkpoint} belongs to {state.get("source")}')
+        return state['rows']
+
+    def write_checkpoint(self, checkpoint, source, rows):
+        if not checkpoint:
+            return
+        # Replace the file atomically, a crash never leaves it broken.
+        temporary = f'{checkpoint}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'source': source, 'rows': rows}, file)
+        os.replace(temporary, checkpoint)
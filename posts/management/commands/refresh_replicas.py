@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from yatube.routers import PRIMARY
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database into the files of the replicas '
+        'listed in REPLICA_DATABASES, standing in for replication.')
+
+    def handle(self, *args, **options):
+        primary = connections[PRIMARY]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Only SQLite databases can be copied.')
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('No replicas in REPLICA_DATABASES.')
+        primary.ensure_connection()
+        for alias in settings.REPLICA_DATABASES:
+            target = sqlite3.connect(
+                connections[alias].settings_dict['NAME'])
+            try:
+                # The backup API copies a consistent snapshot even while
+                # the primary is written to.
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: copied')
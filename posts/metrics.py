@@ -0,0 +1,125 @@
+"""
+Per-view cost instrumentation.
+
+ViewMetricsMiddleware measures every request: number of SQL queries,
+time spent in the database, template rendering time, total time and
+response size. Samples are kept per URL name in a rolling window of the
+process and summarized as percentiles for the internal metrics page.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+
+FIELDS = ('queries', 'db_ms', 'render_ms', 'total_ms', 'bytes')
+
+
+def percentile(values, rank):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return None
+    index = max(0, -(-len(values) * rank // 100) - 1)
+    return values[index]
+
+
+class MetricsRecorder:
+    """Rolling window of request samples per URL name."""
+
+    def __init__(self, window):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, url_name, sample):
+        with self._lock:
+            self._samples[url_name].append(sample)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        with self._lock:
+            samples = {
+                name: list(window) for name, window in self._samples.items()}
+        result = {}
+        for name, window in samples.items():
+            stats = {'count': len(window)}
+            for field in FIELDS:
+                values = sorted(sample[field] for sample in window)
+                stats[field] = {
+                    f'p{rank}': percentile(values, rank)
+                    for rank in PERCENTILES}
+            result[name] = stats
+        return result
+
+
+recorder = MetricsRecorder(settings.VIEW_METRICS_WINDOW)
+
+
+class QueryTimer:
+    """Database execute wrapper counting queries and their time."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+class ViewMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        request._render_seconds = 0.0
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        match = request.resolver_match
+        if match is None:
+            return response
+        sample = {
+            'queries': timer.queries,
+            'db_ms': round(timer.seconds * 1000, 3),
+            'render_ms': round(request._render_seconds * 1000, 3),
+            'total_ms': round(total * 1000, 3),
+            'bytes': 0 if response.streaming else len(response.content),
+        }
+        response.view_metrics = sample
+        recorder.record(match.view_name, sample)
+        budget = settings.VIEW_QUERY_BUDGETS.get(match.view_name)
+        if budget is not None and timer.queries > budget:
+            logger.warning(
+                'View %s ran %d queries, the budget is %d',
+                match.view_name, timer.queries, budget)
+        return response
+
+    def process_template_response(self, request, response):
+        # Called right before the response is rendered, the callback
+        # runs right after it.
+        start = time.perf_counter()
+
+        def stop_timer(rendered):
+            request._render_seconds += time.perf_counter() - start
+
+        response.add_post_render_callback(stop_timer)
+        return response
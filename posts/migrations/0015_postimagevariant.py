@@ -0,0 +1,30 @@
+# Generated by Django 2.2.6 on 2026-10-17 04:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostImageVariant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100, verbose_name='исходная картинка')),
+                ('file', models.ImageField(upload_to='posts/variants/', verbose_name='файл')),
+                ('width', models.PositiveIntegerField(verbose_name='ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='высота')),
+                ('format', models.CharField(max_length=10, verbose_name='формат')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_variants', to='posts.Post', verbose_name='пост')),
+            ],
+            options={
+                'verbose_name': 'вариант картинки',
+                'verbose_name_plural': 'варианты картинок',
+            },
+        ),
+    ]
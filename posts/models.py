@@ -32,16 +32,53 @@ class Post(models.Model):
     image = models.ImageField(
         'картинка', upload_to='posts/', blank=True, null=True,
         help_text='Выберите картинку для публикации поста.')
+    comment_count = models.PositiveIntegerField(
+        'количество комментариев', default=0, editable=False)
+    # Grows with every change shown on the post card, see posts/cards.py.
+    version = models.PositiveIntegerField(
+        'версия', default=1, editable=False)
 
     class Meta:
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class PostImageVariant(models.Model):
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE,
+        related_name='image_variants', verbose_name='пост')
+    source = models.CharField('исходная картинка', max_length=100)
+    file = models.ImageField('файл', upload_to='posts/variants/')
+    width = models.PositiveIntegerField('ширина')
+    height = models.PositiveIntegerField('высота')
+    format = models.CharField('формат', max_length=10)
+
+    class Meta:
+        verbose_name = 'вариант картинки'
+        verbose_name_plural = 'варианты картинок'
+
+    def __str__(self):
+        return f'{self.source} {self.width}w {self.format}'
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         Post, on_delete=models.CASCADE,
@@ -57,7 +94,13 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
-        ordering = ['-created']
+        ordering = ['-created', '-id']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -78,3 +121,45 @@ class Follow(models.Model):
                 name='following_unique',
             ),
         ]
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='counters', verbose_name='пользователь')
+    posts_count = models.PositiveIntegerField('записей', default=0)
+    followers_count = models.PositiveIntegerField('подписчиков', default=0)
+    following_count = models.PositiveIntegerField('подписок', default=0)
+
+    class Meta:
+        verbose_name = 'счетчики пользователя'
+        verbose_name_plural = 'счетчики пользователей'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='timeline', verbose_name='подписчик')
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE,
+        related_name='timeline_entries', verbose_name='пост')
+    pub_date = models.DateTimeField('дата публикации')
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='timeline_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx',
+            ),
+        ]
@@ -0,0 +1,250 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import DateField, FloatField, Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    """Cursor token can't be decoded."""
+
+
+def encode_cursor(values):
+    """Pack ordering key values into an opaque url-safe token."""
+    data = [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, types):
+    """
+    Unpack a token made by encode_cursor, checking every value against
+    the matching python type of `types` (datetime, int or float).
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(token)
+    if not isinstance(data, list) or len(data) != len(types):
+        raise InvalidCursor(token)
+    values = []
+    for value, value_type in zip(data, types):
+        # bool is an int subclass but never a key value.
+        if isinstance(value, bool):
+            raise InvalidCursor(token)
+        if value_type is datetime:
+            if not isinstance(value, str):
+                raise InvalidCursor(token)
+            try:
+                value = parse_datetime(value)
+            except ValueError:
+                value = None
+            if value is None:
+                raise InvalidCursor(token)
+        elif value_type is float:
+            if not isinstance(value, (int, float)):
+                raise InvalidCursor(token)
+            value = float(value)
+        elif not isinstance(value, int):
+            raise InvalidCursor(token)
+        values.append(value)
+    return values
+
+
+class CursorPage:
+    """One page of a keyset paginated feed, duck-typed like Page."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<CursorPage of %s items>' % len(self)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.cursor_for(self.object_list[len(self) - 1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.cursor_for(self.object_list[0])
+
+
+class CursorPaginator:
+    """
+    Paginate a queryset by its ordering key instead of OFFSET.
+
+    `ordering` lists the lookups of a unique key, each may be prefixed
+    with '-' for descending order. `attributes` names the attributes of
+    the objects holding the key values; by default the last part of
+    every lookup is used.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id'),
+                 attributes=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.lookups = tuple(field.lstrip('-') for field in self.ordering)
+        self.descending = tuple(
+            field.startswith('-') for field in self.ordering)
+        if attributes is None:
+            attributes = tuple(
+                lookup.split('__')[-1] for lookup in self.lookups)
+        self.attributes = tuple(attributes)
+
+    def cursor_for(self, obj):
+        return encode_cursor(
+            [getattr(obj, attribute) for attribute in self.attributes])
+
+    def _seek(self, values, forward, inclusive=False):
+        """
+        Build a filter for rows lying after (forward) or before
+        the key `values` in the paginator ordering.
+        """
+        operators = [
+            'lt' if descending == forward else 'gt'
+            for descending in self.descending]
+        # The leading range condition lets the database seek the index,
+        # the disjunction below only breaks ties within that range.
+        condition = Q(**{
+            f'{self.lookups[0]}__{operators[0]}e': values[0]})
+        ties = Q(**{f'{self.lookups[0]}__{operators[0]}': values[0]})
+        for position in range(1, len(self.lookups)):
+            equal = dict(zip(self.lookups[:position], values[:position]))
+            ties |= Q(**equal, **{
+                f'{self.lookups[position]}__{operators[position]}':
+                    values[position]})
+        if inclusive:
+            ties |= Q(**dict(zip(self.lookups, values)))
+        return condition & ties
+
+    def _key_types(self, queryset):
+        """
+        Return the python types of the key values, following relations
+        to their target fields and annotations to their output fields.
+        """
+        types = []
+        for lookup in self.lookups:
+            if lookup in queryset.query.annotations:
+                field = queryset.query.annotations[lookup].output_field
+            else:
+                opts = queryset.model._meta
+                for name in lookup.split('__'):
+                    field = opts.pk if name == 'pk' else opts.get_field(name)
+                    if field.is_relation:
+                        opts = field.related_model._meta
+            while field.is_relation:
+                field = field.target_field
+            if isinstance(field, DateField):
+                types.append(datetime)
+            elif isinstance(field, FloatField):
+                types.append(float)
+            else:
+                types.append(int)
+        return tuple(types)
+
+    def _reversed_ordering(self):
+        return tuple(
+            lookup if descending else '-' + lookup
+            for lookup, descending in zip(self.lookups, self.descending))
+
+    def page(self, after=None, before=None):
+        """
+        Return the page following the `after` token, preceding the
+        `before` token, or the first page. Raise InvalidCursor for
+        broken tokens.
+        """
+        queryset = self.object_list.order_by(*self.ordering)
+        types = self._key_types(queryset)
+        if after:
+            return self._page_after(queryset, decode_cursor(after, types))
+        if before:
+            return self._page_before(queryset, decode_cursor(before, types))
+        rows = list(queryset[:self.per_page + 1])
+        return CursorPage(
+            rows[:self.per_page], self,
+            has_next=len(rows) > self.per_page, has_previous=False)
+
+    def get_page(self, after=None, before=None):
+        """
+        Return a page like page() does, but give the first page for
+        broken tokens, the same way Paginator.get_page treats bad numbers.
+        """
+        try:
+            return self.page(after, before)
+        except InvalidCursor:
+            return self.page()
+
+    def _page_after(self, queryset, values):
+        # One row more than the page tells whether there is a next page,
+        # the rows before the cursor are taken to be there.
+        rows = list(queryset.filter(
+            self._seek(values, forward=True))[:self.per_page + 1])
+        if not rows:
+            return CursorPage([], self, False, False)
+        return CursorPage(
+            rows[:self.per_page], self,
+            has_next=len(rows) > self.per_page, has_previous=True)
+
+    def _page_before(self, queryset, values):
+        # Walk backwards from the cursor, then put the page back in the
+        # regular order.
+        rows = list(queryset.filter(self._seek(values, forward=False))
+                    .order_by(*self._reversed_ordering())[:self.per_page + 1])
+        if not rows:
+            return self.page()
+        return CursorPage(
+            rows[:self.per_page][::-1], self,
+            has_next=True, has_previous=len(rows) > self.per_page)
+
+
+def get_feed_page(request, post_list, ordering=('-pub_date', '-id')):
+    """
+    Paginate a feed for the template context.
+
+    The numbered Paginator is used unless the POSTS_PAGINATION_MODE
+    setting is 'cursor' or the request already carries a cursor token.
+    """
+    per_page = settings.POSTS_PER_PAGE
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if (after or before
+            or settings.POSTS_PAGINATION_MODE == 'cursor'):
+        paginator = CursorPaginator(post_list, per_page, ordering)
+        return {'page': paginator.get_page(after, before)}
+    paginator = Paginator(post_list.order_by(*ordering), per_page)
+    page = paginator.get_page(request.GET.get('page'))
+    return {'page': page, 'paginator': paginator}
@@ -0,0 +1,156 @@
+"""
+Full-text search over posts with SQLite FTS5.
+
+posts_post_fts is an external content FTS5 index over Post.text kept
+in sync by triggers, so bulk inserts and raw updates are indexed too.
+Results are ordered by bm25 rank and paginated by (rank, rowid).
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .pagination import (CursorPage, InvalidCursor, decode_cursor,
+                         encode_cursor)
+
+FTS_TABLE = 'posts_post_fts'
+
+CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+
+TRIGGERS = {
+    f'{FTS_TABLE}_insert': (
+        'AFTER INSERT ON posts_post BEGIN '
+        f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); '
+        'END'),
+    f'{FTS_TABLE}_delete': (
+        'AFTER DELETE ON posts_post BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) '
+        "VALUES ('delete', old.id, old.text); "
+        'END'),
+    f'{FTS_TABLE}_update': (
+        'AFTER UPDATE OF text ON posts_post BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) '
+        "VALUES ('delete', old.id, old.text); "
+        f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); '
+        'END'),
+}
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def ensure_index(using_connection, create=True):
+    """
+    Create the index and its triggers if they are missing.
+
+    SQLite migrations rebuild posts_post by copying it into a new table,
+    which drops the triggers; the index is rebuilt after they are
+    restored, so the posts changed meanwhile are found again. With
+    `create` False only an existing index is repaired.
+    """
+    if using_connection.vendor != 'sqlite':
+        return
+    with using_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master "
+            "WHERE name = %s OR tbl_name = 'posts_post'", (FTS_TABLE,))
+        existing = {name for object_type, name in cursor.fetchall()}
+        if FTS_TABLE not in existing and not create:
+            return
+        missing = [name for name in TRIGGERS if name not in existing]
+        if FTS_TABLE in existing and not missing:
+            return
+        cursor.execute(CREATE_TABLE)
+        for name in missing:
+            cursor.execute(f'CREATE TRIGGER {name} {TRIGGERS[name]}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def to_match(query):
+    """Turn user input into an FTS5 query of quoted terms."""
+    return ' '.join(
+        '"{}"'.format(term.replace('"', '""')) for term in query.split())
+
+
+def filter_posts(queryset, query):
+    """Restrict a Post queryset to the posts matching the query."""
+    match = to_match(query)
+    if not match:
+        return queryset.none()
+    if not is_available():
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,)))
+
+
+class SearchPaginator:
+    """Keyset pagination of ranked search results."""
+
+    def __init__(self, query, per_page):
+        self.match = to_match(query)
+        self.per_page = per_page
+
+    def cursor_for(self, post):
+        return encode_cursor([post.search_rank, post.pk])
+
+    def _ranked_ids(self, condition='', params=(), descending=False):
+        # One row more than the page tells whether the list goes on.
+        order = 'DESC' if descending else 'ASC'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, rank FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s {condition} '
+                f'ORDER BY rank {order}, rowid {order} LIMIT %s',
+                (self.match, *params, self.per_page + 1))
+            return cursor.fetchall()
+
+    def get_page(self, after=None, before=None):
+        if not self.match or not is_available():
+            return CursorPage([], self, False, False)
+        try:
+            if after:
+                rank, rowid = decode_cursor(after, (float, int))
+                rows = self._ranked_ids(
+                    'AND (rank > %s OR (rank = %s AND rowid > %s))',
+                    (rank, rank, rowid))
+                # The matches before the cursor are taken to be there.
+                has_next, has_previous = len(rows) > self.per_page, True
+                rows = rows[:self.per_page]
+            elif before:
+                rank, rowid = decode_cursor(before, (float, int))
+                rows = self._ranked_ids(
+                    'AND (rank < %s OR (rank = %s AND rowid < %s))',
+                    (rank, rank, rowid), descending=True)
+                if not rows:
+                    return self.get_page()
+                has_next, has_previous = True, len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+            else:
+                rows = self._ranked_ids()
+                has_next, has_previous = len(rows) > self.per_page, False
+                rows = rows[:self.per_page]
+        except InvalidCursor:
+            return self.get_page()
+        if not rows:
+            return CursorPage([], self, False, False)
+        posts = Post.objects.select_related(
+            'author', 'group').prefetch_related(
+            'image_variants').in_bulk([rowid for rowid, rank in rows])
+        object_list = []
+        for rowid, rank in rows:
+            if rowid in posts:
+                posts[rowid].search_rank = rank
+                object_list.append(posts[rowid])
+        return CursorPage(object_list, self, has_next, has_previous)
+
+
+def search_page(query, after=None, before=None):
+    return SearchPaginator(query, settings.POSTS_PER_PAGE).get_page(
+        after, before)
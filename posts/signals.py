@@ -0,0 +1,161 @@
+from django.db import connections
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import cache, counters, graph, search, timeline, updates
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+@receiver(post_save, sender=User)
+def create_counters(sender, instance, created, raw=False, **kwargs):
+    """Start counters of a new user at zero."""
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+def refresh_posts(posts, *scopes):
+    """
+    Move the posts to new card versions and invalidate the feeds they
+    are shown in along with the scopes.
+    """
+    scopes = set(scopes)
+    for author_id, group_id in posts.order_by().values_list(
+            'author_id', 'group_id').distinct():
+        scopes.update(cache.post_scopes(author_id, group_id))
+    posts.update(version=F('version') + 1)
+    cache.bump(*scopes)
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    """Keep the stored username to refresh the cards of a renamed user."""
+    if instance.pk and not raw and update_fields != frozenset(['last_login']):
+        instance._saved_username = User.objects.filter(
+            pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_profile(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which isn't shown anywhere.
+    if update_fields == frozenset(['last_login']):
+        return
+    saved_username = getattr(instance, '_saved_username', None)
+    if saved_username not in (None, instance.username):
+        # Cards show the username of the author, post pages show it
+        # under the comments.
+        commented = Post.objects.filter(
+            comments__author_id=instance.pk).order_by().values_list(
+            'author_id', flat=True).distinct()
+        refresh_posts(
+            Post.objects.filter(author_id=instance.pk),
+            *(f'author:{author_id}' for author_id in commented))
+    cache.bump('profiles', f'author:{instance.pk}')
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_name(sender, instance, raw=False, **kwargs):
+    """Keep the stored title and slug to refresh the cards of the group."""
+    if instance.pk and not raw:
+        instance._saved_name = Group.objects.filter(
+            pk=instance.pk).values_list('title', 'slug').first()
+
+
+@receiver(pre_delete, sender=Group)
+def forget_group(sender, instance, **kwargs):
+    # Posts are detached from the group right after, the cards have to
+    # be found while they still point at it.
+    refresh_posts(Post.objects.filter(group_id=instance.pk))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    saved_name = getattr(instance, '_saved_name', None)
+    if saved_name not in (None, (instance.title, instance.slug)):
+        # Cards link to the group by its slug and show its title.
+        refresh_posts(Post.objects.filter(group_id=instance.pk))
+    cache.bump('groups', f'group:{instance.pk}')
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    """
+    Keep the stored group of an edited post to invalidate its feed
+    and move the post to the next version for its card.
+    """
+    if instance.pk and not raw:
+        saved = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'version').first()
+        if saved is not None:
+            instance._saved_group_id, version = saved
+            instance.version = version + 1
+
+
+@receiver(post_save, sender=Post)
+def deliver_post(sender, instance, created, raw=False, **kwargs):
+    """Put a new post into the followers' timelines and count it."""
+    if created and not raw:
+        counters.change_user(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+        updates.announce(instance)
+    cache.bump(*cache.post_scopes(
+        instance.author_id, instance.group_id,
+        getattr(instance, '_saved_group_id', None)))
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, posts_count=-1)
+    cache.bump(*cache.post_scopes(instance.author_id, instance.group_id))
+
+
+def invalidate_comment_feeds(comment):
+    post = Post.objects.filter(pk=comment.post_id).values_list(
+        'author_id', 'group_id').first()
+    if post is not None:
+        cache.bump(*cache.post_scopes(*post))
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post(instance.post_id, 1)
+    invalidate_comment_feeds(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+    invalidate_comment_feeds(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    """Fill the timeline with the posts of a newly followed author."""
+    if created and not raw:
+        counters.change_user(instance.user_id, following_count=1)
+        counters.change_user(instance.author_id, followers_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        graph.record(instance.user_id, instance.author_id, True)
+    cache.bump('profiles', f'author:{instance.user_id}',
+               f'author:{instance.author_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    """Drop the posts of an unfollowed author from the timeline."""
+    counters.change_user(instance.user_id, following_count=-1)
+    counters.change_user(instance.author_id, followers_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    graph.record(instance.user_id, instance.author_id, False)
+    cache.bump('profiles', f'author:{instance.user_id}',
+               f'author:{instance.author_id}')
+
+
+def repair_search_index(sender, using, **kwargs):
+    """Restore search triggers dropped by table rebuilds in migrations."""
+    search.ensure_index(connections[using], create=False)
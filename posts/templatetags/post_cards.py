@@ -0,0 +1,28 @@
+from django import template
+
+from posts import cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Render the cards of the posts from the card cache."""
+    return cards.render_cards(posts)
+
+
+class EditButtonsNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        return cards.place_edit_buttons(
+            self.nodelist.render(context), context['user'])
+
+
+@register.tag
+def edit_buttons(parser, token):
+    """Put the edit buttons of the viewer's posts into the cards inside."""
+    nodelist = parser.parse(('endedit_buttons',))
+    parser.delete_first_token()
+    return EditButtonsNode(nodelist)
@@ -0,0 +1,34 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(image, alias):
+    """
+    Return the pregenerated thumbnail of the image or None,
+    never generating it during the render.
+    """
+    if not image:
+        return None
+    return thumbnails.get_ready_thumbnail(image, alias)
+
+
+@register.simple_tag
+def image_srcsets(post):
+    """
+    Return srcset strings of the post image variants by format,
+    empty while the variants are not generated.
+    """
+    srcsets = {}
+    if not post.image:
+        return srcsets
+    for variant in post.image_variants.all():
+        if variant.source == post.image.name:
+            srcsets.setdefault(variant.format, []).append(
+                f'{variant.file.url} {variant.width}w')
+    return {
+        image_format: ', '.join(sources)
+        for image_format, sources in srcsets.items()}
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+User = get_user_model()
+
+TWO_PROCESSES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-shared',
+    },
+    # Local tiers are kept per location, so these two aliases behave
+    # like the same cache in two worker processes.
+    'first': {
+        'BACKEND': 'yatube.cache.TwoTierCache',
+        'LOCATION': 'first',
+        'OPTIONS': {'SHARED': 'shared', 'MAX_ENTRIES': 3},
+    },
+    'second': {
+        'BACKEND': 'yatube.cache.TwoTierCache',
+        'LOCATION': 'second',
+        'OPTIONS': {'SHARED': 'shared', 'SYNC_INTERVAL': 60},
+    },
+}
+
+
+@override_settings(CACHES=TWO_PROCESSES)
+class TwoTierCacheTest(TestCase):
+    def setUp(self):
+        self.first = caches['first']
+        self.second = caches['second']
+        self.first.clear()
+        self.second.clear()
+        caches['shared'].clear()
+
+    def counts(self, cache):
+        # Statistics are kept for the whole process, compare the changes.
+        stats = cache.stats()
+        return [stats[tier][event] for tier in ('local', 'shared')
+                for event in ('hits', 'misses')]
+
+    def test_second_read_is_served_locally(self):
+        """A value read once is not fetched from the shared tier again."""
+        self.first.set('key', 'значение')
+        before = self.counts(self.second)
+        self.assertEqual(self.second.get('key'), 'значение')
+        self.assertEqual(self.second.get('key'), 'значение')
+        changes = [new - old for new, old in zip(
+            self.counts(self.second), before)]
+        self.assertEqual(
+            changes, [1, 1, 1, 0],
+            'Повторное чтение должно обслуживаться локальным уровнем.')
+
+    def test_write_of_other_process_invalidates_after_request(self):
+        """Local copies are dropped once the next request starts."""
+        self.first.set('key', 'старое')
+        self.assertEqual(self.second.get('key'), 'старое')
+        self.first.set('key', 'новое')
+        self.assertEqual(
+            self.second.get('key'), 'старое',
+            'Штампы не должны проверяться при каждом чтении.')
+        Client().get(reverse('about:author'))
+        self.assertEqual(self.second.get('key'), 'новое')
+
+    def test_incr_and_delete_invalidate(self):
+        """Counters and deletions reach the other processes too."""
+        self.first.set('counter', 1)
+        self.assertEqual(self.second.get('counter'), 1)
+        self.assertEqual(self.first.incr('counter'), 2)
+        Client().get(reverse('about:author'))
+        self.assertEqual(self.second.get('counter'), 2)
+        self.second.delete('counter')
+        Client().get(reverse('about:author'))
+        self.assertIsNone(self.first.get('counter'))
+
+    def test_local_tier_is_bounded(self):
+        """The least recently used values leave the local tier."""
+        for number in range(5):
+            self.first.set(f'key{number}', number)
+        stats = self.first.stats()
+        self.assertEqual(stats['local']['entries'], 3)
+        hits = self.first.stats()['shared']['hits']
+        self.assertEqual(self.first.get('key0'), 0, 'Значение потеряно.')
+        self.assertEqual(self.first.stats()['shared']['hits'], hits + 1)
+
+    def test_values_are_copied(self):
+        """Changing a returned value doesn't change the cached one."""
+        self.first.set('list', [1])
+        self.first.get('list').append(2)
+        self.assertEqual(self.first.get('list'), [1])
+
+    def test_stats_page(self):
+        """Staff can see the statistics of every two-tier cache."""
+        staff = User.objects.create_user(username='Staff', is_staff=True)
+        client = Client()
+        client.force_login(staff)
+        misses = self.first.stats()['shared']['misses']
+        self.first.get('missing')
+        stats = client.get(reverse('posts:cache_stats')).json()
+        self.assertEqual(set(stats), {'first', 'second'})
+        self.assertEqual(stats['first']['shared']['misses'], misses + 1)
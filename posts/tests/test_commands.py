@@ -0,0 +1,211 @@
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import benchmark, importer
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class ImportContentTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def write_jsonl(self, name, rows):
+        return self.write(
+            name, ''.join(json.dumps(row) + '\n' for row in rows))
+
+    def run_import(self, *args, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'import_content', *args, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_all_kinds(self):
+        """Imported content keeps dates, fills timelines and counters."""
+        self.run_import('users', self.write(
+            'users.csv', 'username,first_name\nArtur,Артур\nMiniput,\n'))
+        self.run_import('groups', self.write_jsonl('groups.jsonl', [
+            {'title': 'Котики', 'slug': 'cats', 'description': 'Про котов'},
+        ]))
+        self.run_import('follows', self.write_jsonl('follows.jsonl', [
+            {'user': 'Miniput', 'author': 'Artur'},
+        ]))
+        stdout, stderr = self.run_import(
+            'posts', self.write_jsonl('posts.jsonl', [
+                {'id': 7, 'text': 'Старый пост', 'author': 'Artur',
+                 'group': 'cats', 'pub_date': '2015-05-01T10:00:00+00:00'},
+                {'text': 'Без группы', 'author': 'Artur'},
+                {'text': 'Чужой пост', 'author': 'Nobody'},
+                {'author': 'Artur'},
+            ]))
+        self.assertIn('Created 2', stdout)
+        self.assertIn('Row 3: unknown user Nobody', stderr)
+        self.assertIn('Row 4: text is required', stderr)
+        post = Post.objects.get(pk=7)
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.group, Group.objects.get(slug='cats'))
+        self.run_import('comments', self.write_jsonl('comments.jsonl', [
+            {'post': 7, 'author': 'Miniput', 'text': 'Комментарий'},
+        ]))
+        self.assertEqual(Comment.objects.get().post_id, 7)
+        author = User.objects.get(username='Artur')
+        self.assertEqual(author.first_name, 'Артур')
+        self.assertEqual(author.counters.posts_count, 2)
+        self.assertEqual(author.counters.followers_count, 1)
+        self.assertEqual(Post.objects.get(pk=7).comment_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='Miniput').count(),
+            2, 'Импорт не добавляет посты в ленты подписчиков.')
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_checkpoint_resumes_import(self):
+        """A rerun with the checkpoint skips the imported rows."""
+        User.objects.create_user(username='Artur')
+        path = self.write_jsonl('posts.jsonl', [
+            {'text': f'Пост {number}', 'author': 'Artur'}
+            for number in range(5)])
+        checkpoint = os.path.join(self.directory, 'posts.checkpoint')
+        self.run_import('posts', path, batch_size=2, checkpoint=checkpoint)
+        self.assertEqual(Post.objects.count(), 5)
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'text': 'Новый', 'author': 'Artur'}))
+        stdout, stderr = self.run_import(
+            'posts', path, batch_size=2, checkpoint=checkpoint)
+        self.assertIn('Resuming after row 5', stdout)
+        self.assertEqual(Post.objects.count(), 6)
+
+    def test_explicit_ids_are_imported_once(self):
+        """Rows with ids stored before are skipped on a rerun."""
+        User.objects.create_user(username='Artur')
+        path = self.write_jsonl('posts.jsonl', [
+            {'id': number, 'text': f'Пост {number}', 'author': 'Artur'}
+            for number in range(1, 4)])
+        self.run_import('posts', path)
+        stdout, stderr = self.run_import('posts', path)
+        self.assertIn('skipped 3 existing', stdout)
+        self.assertEqual(Post.objects.count(), 3)
+
+    def client_for(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def test_counters_follow_every_batch(self):
+        """Counters match the batches committed before an interruption."""
+        author = User.objects.create_user(username='Artur')
+        reader = User.objects.create_user(username='Miniput')
+        posts = importer.import_rows('posts', [
+            json.dumps({'text': f'Пост {number}', 'author': 'Artur'})
+            for number in range(5)], batch_size=2)
+        next(posts)
+        author.counters.refresh_from_db()
+        self.assertEqual(author.counters.posts_count, 2)
+        list(importer.import_rows('follows', [
+            json.dumps({'user': 'Miniput', 'author': 'Artur'})] * 2))
+        reader.counters.refresh_from_db()
+        self.assertEqual(reader.counters.following_count, 1)
+        # Unfollowing decrements the imported counters.
+        response = self.client_for(reader).get(
+            reverse('posts:profile_unfollow', args=['Artur']))
+        self.assertEqual(response.status_code, 302)
+        author.counters.refresh_from_db()
+        self.assertEqual(author.counters.followers_count, 0)
+
+
+class ExportUserDataTest(TestCase):
+    def test_export_to_file(self):
+        """The command writes the same archive as the download view."""
+        author = User.objects.create_user(username='Artur')
+        Post.objects.create(text='Тестовый пост', author=author)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'artur.zip')
+        call_command(
+            'export_user_data', 'Artur', path, stdout=StringIO())
+        with zipfile.ZipFile(path) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()),
+                ['comments.json', 'posts.json', 'profile.json'])
+            self.assertEqual(json.loads(archive.read('comments.json')), [])
+
+
+class GenerateDatasetTest(TestCase):
+    def generate(self):
+        call_command(
+            'generate_dataset', users=30, groups=5, follows=100, posts=300,
+            comments=200, seed=7, stdout=StringIO())
+        return list(Post.objects.order_by('pk').values_list(
+            'pk', 'author_id', 'group_id', 'text', 'pub_date'))
+
+    def test_dataset_is_seeded_and_skewed(self):
+        """The same seed gives the same data with a few top authors."""
+        posts = self.generate()
+        self.assertEqual(len(posts), 300)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertEqual(
+            TimelineEntry.objects.count(),
+            sum(Post.objects.filter(author=follow.author).count()
+                for follow in Follow.objects.select_related('author')),
+            'Посты не разосланы по лентам подписчиков.')
+        top = User.objects.order_by('-counters__posts_count').first()
+        self.assertGreater(
+            top.counters.posts_count, 300 / 30 * 3,
+            'Авторы распределены не по степенному закону.')
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.assertEqual(self.generate(), posts)
+
+
+class BenchmarkTest(TestCase):
+    def test_benchmark_measures_every_view(self):
+        """All views are measured on a small generated dataset."""
+        call_command(
+            'generate_dataset', users=10, groups=2, follows=20, posts=30,
+            comments=30, stdout=StringIO())
+        cache.set('site-entry', 'значение')
+        results = benchmark.run(iterations=1)
+        self.assertEqual(
+            cache.get('site-entry'), 'значение',
+            'Бенчмарк не должен очищать кэш сайта.')
+        self.assertEqual(set(results), {
+            'index', 'group_posts', 'profile', 'post_view', 'follow_index',
+            'new_post', 'add_comment', 'index:warm', 'group_posts:warm',
+            'profile:warm', 'post_view:warm', 'follow_index:warm'})
+        for name, metrics in results.items():
+            if not name.endswith(':warm'):
+                self.assertGreater(metrics['queries'], 0)
+            self.assertGreater(metrics['peak_kb'], 0)
+        # A cached feed page is served without the queries of the page.
+        for name in ('index', 'group_posts'):
+            self.assertLess(
+                results[f'{name}:warm']['queries'], results[name]['queries'])
+
+    def test_compare_reports_regressions(self):
+        baseline = {'index': {'time_ms': 10, 'queries': 3, 'peak_kb': 100}}
+        self.assertEqual(benchmark.compare(
+            {'index': {'time_ms': 16, 'queries': 3, 'peak_kb': 120}},
+            baseline), [])
+        regressions = benchmark.compare(
+            {'index': {'time_ms': 30, 'queries': 4, 'peak_kb': 200}},
+            baseline)
+        self.assertEqual(len(regressions), 3, regressions)
@@ -1,12 +1,15 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from posts.forms import PostForm
 from posts.models import Group, Post
 
 User = get_user_model()
@@ -129,6 +132,54 @@ class PostFormTests(TestCase):
             'Загрузите правильное изображение. Файл, который вы загрузили,'
             ' поврежден или не является изображением.')
 
+    @staticmethod
+    def get_png(size):
+        buffer = BytesIO()
+        Image.new('RGB', size, (255, 0, 0)).save(buffer, 'PNG')
+        return SimpleUploadedFile(
+            name='big.png',
+            content=buffer.getvalue(),
+            content_type='image/png'
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIDE=20)
+    def test_create_post_downscales_big_image(self):
+        """Image bigger than the master size is stored downscaled."""
+        self.authorized_client.post(
+            reverse('posts:new_post'),
+            {'text': 'Пост с большой картинкой',
+             'image': self.get_png((50, 40))})
+        post = Post.objects.get(text='Пост с большой картинкой')
+        self.assertEqual(
+            (post.image.width, post.image.height), (20, 16),
+            'Большая картинка сохраняется без уменьшения.')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=20)
+    def test_downscaled_image_is_closed_after_save(self):
+        """The temporary file of the downscaled copy isn't left open."""
+        form = PostForm(
+            {'text': 'Пост с большой картинкой'},
+            {'image': self.get_png((50, 40))},
+            instance=Post(author=self.author))
+        self.assertTrue(form.is_valid())
+        master = form.cleaned_data['image']
+        form.save()
+        self.assertTrue(
+            master.file.closed, 'Временный файл картинки не закрывается.')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_create_post_rejects_too_many_pixels(self):
+        """Image with too many pixels is rejected before decoding."""
+        response = self.authorized_client.post(
+            reverse('posts:new_post'),
+            {'text': 'Пост с огромной картинкой',
+             'image': self.get_png((50, 40))})
+        self.assertFormError(
+            response, 'form', 'image',
+            'Изображение слишком большое: 50×40 точек.')
+        self.assertFalse(
+            Post.objects.filter(text='Пост с огромной картинкой').exists())
+
     def test_edit_post(self):
         """Form change existing post and redirect to the 'post' page."""
         post = Post.objects.create(
@@ -0,0 +1,101 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts import graph
+from posts.graph import FollowGraph
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    def setUp(self):
+        self.graph = FollowGraph(
+            [(1, 2), (1, 3), (2, 3), (2, 4), (3, 1), (3, 4), (5, 4)])
+
+    def test_rows_and_counts(self):
+        self.assertEqual(self.graph.following(1), [2, 3])
+        self.assertEqual(self.graph.followers(4), [2, 3, 5])
+        self.assertEqual(self.graph.followers_count(4), 3)
+        self.assertEqual(self.graph.following_count(4), 0)
+        self.assertTrue(self.graph.is_mutual(1, 3))
+        self.assertFalse(self.graph.is_mutual(1, 2))
+
+    def test_changes_after_build(self):
+        """Follows and unfollows are applied on top of the arrays."""
+        self.graph.change(1, 2, False)
+        self.graph.change(1, 4, True)
+        # Users registered after the graph was built.
+        self.graph.change(7, 1, True)
+        self.assertEqual(self.graph.following(1), [3, 4])
+        self.assertEqual(self.graph.followers(2), [])
+        self.assertEqual(self.graph.followers(1), [3, 7])
+        self.assertTrue(self.graph.follows(7, 1))
+        self.assertEqual(self.graph.followers_count(4), 4)
+
+    def test_suggestions(self):
+        """Authors followed by the followed ones come first."""
+        self.assertEqual(self.graph.suggestions(1, 5), [4])
+        self.assertEqual(
+            self.graph.suggestions(6, 2), [4, 3],
+            'Без подписок предлагаются самые популярные авторы.')
+
+
+class WhoToFollowTest(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='Miniput')
+        self.author = User.objects.create_user(username='Artur')
+        self.suggested = User.objects.create_user(username='Leo')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.author, author=self.suggested)
+        Follow.objects.create(user=self.author, author=self.reader)
+        graph.reset()
+        graph.reload()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_profile_shows_suggestions(self):
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'Artur'}))
+        self.assertEqual(
+            response.context['suggestions'], [self.suggested],
+            'В профиле должны быть рекомендации, кого почитать.')
+        self.assertTrue(response.context['mutual'])
+        self.assertContains(response, '@Leo')
+
+    def test_no_suggestions_until_graph_is_loaded(self):
+        graph.reset()
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'Artur'}))
+        self.assertEqual(response.context['suggestions'], [])
+        self.assertTrue(response.context['mutual'])
+
+
+class FollowGraphUpdateTest(TransactionTestCase):
+    # The graph hears of follows when their transaction commits.
+    def test_follows_update_loaded_graph(self):
+        reader = User.objects.create_user(username='Miniput')
+        author = User.objects.create_user(username='Artur')
+        graph.reset()
+        graph.reload()
+        follow_graph = graph.get_graph()
+        follow = Follow.objects.create(user=reader, author=author)
+        self.assertTrue(follow_graph.follows(reader.pk, author.pk))
+        follow.delete()
+        self.assertFalse(follow_graph.follows(reader.pk, author.pk))
+
+    @override_settings(FOLLOW_GRAPH_AUTOLOAD=True)
+    def test_graph_is_loaded_in_background(self):
+        reader = User.objects.create_user(username='Miniput')
+        author = User.objects.create_user(username='Artur')
+        Follow.objects.create(user=reader, author=author)
+        graph.reset()
+        self.assertIsNone(graph.get_graph())
+        deadline = time.monotonic() + 10
+        while graph.get_graph() is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(graph.get_graph().follows(reader.pk, author.pk))
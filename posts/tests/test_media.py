@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+from django.utils.http import http_date
+
+CONTENT = bytes(range(256)) * 4
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_SERVE_MODE='python')
+class MediaServeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name in ('posts/image.jpg', 'posts/variants/ab/ab-320.webp',
+                     'cache/ab/cd/abcd.jpg'):
+            path = os.path.join(MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+        cls.mtime = os.stat(
+            os.path.join(MEDIA_ROOT, 'posts/image.jpg')).st_mtime
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+
+    def get(self, path='/media/posts/image.jpg', **headers):
+        response = self.client.get(path, **headers)
+        content = b''
+        if response.status_code in (200, 206):
+            content = response.getvalue()
+        response.close()
+        return response, content
+
+    def test_whole_file(self):
+        response, content = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content, CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(
+            response['Cache-Control'],
+            f'public, max-age={settings.MEDIA_CACHE_SECONDS}')
+
+    def test_content_addressed_files_are_immutable(self):
+        response, _ = self.get('/media/posts/variants/ab/ab-320.webp')
+        self.assertIn(
+            'immutable', response['Cache-Control'],
+            'Варианты картинок должны кешироваться навсегда.')
+        response, _ = self.get('/media/cache/ab/cd/abcd.jpg')
+        self.assertNotIn(
+            'immutable', response['Cache-Control'],
+            'Миниатюры sorl называются не по содержимому.')
+
+    def test_ranges(self):
+        """Single byte ranges get 206, ranges past the end 416."""
+        ranges = {
+            'bytes=10-19': (206, CONTENT[10:20], 'bytes 10-19/1024'),
+            'bytes=1000-': (206, CONTENT[1000:], 'bytes 1000-1023/1024'),
+            'bytes=-4': (206, CONTENT[-4:], 'bytes 1020-1023/1024'),
+            'bytes=2000-': (416, b'', 'bytes */1024'),
+        }
+        for header, (status, expected, content_range) in ranges.items():
+            with self.subTest(value=header):
+                response, content = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(content, expected)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_if_range_of_other_version_sends_whole_file(self):
+        response, content = self.get(
+            HTTP_RANGE='bytes=10-19',
+            HTTP_IF_RANGE=http_date(self.mtime - 60))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content, CONTENT)
+
+    def test_not_modified(self):
+        response, _ = self.get(HTTP_IF_MODIFIED_SINCE=http_date(self.mtime))
+        self.assertEqual(response.status_code, 304)
+
+    def test_paths_outside_media_root(self):
+        for path in ('/media/../manage.py', '/media/posts/missing.jpg',
+                     '/media/posts/'):
+            with self.subTest(value=path):
+                response, _ = self.get(path)
+                self.assertEqual(response.status_code, 404)
+
+    def test_front_end_server_modes(self):
+        """Redirect modes leave the body to the front-end server."""
+        modes = {
+            'x-accel-redirect': (
+                'X-Accel-Redirect', '/internal-media/posts/image.jpg'),
+            'x-sendfile': (
+                'X-Sendfile', os.path.join(MEDIA_ROOT, 'posts/image.jpg')),
+        }
+        for mode, (header, value) in modes.items():
+            with self.subTest(value=mode):
+                with self.settings(MEDIA_SERVE_MODE=mode):
+                    response = self.client.get('/media/posts/image.jpg')
+                self.assertEqual(response[header], value)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['Content-Type'], 'image/jpeg')
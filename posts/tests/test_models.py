@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from posts.models import Comment, Group, Post
+from posts.models import Comment, Follow, Group, Post, UserCounters
 
 User = get_user_model()
 
@@ -81,3 +84,54 @@ class CommentModelTest(TestCase):
         self.assertEquals(
             expected_show_object, str(test_comment),
             'Метод __str__ модели Comment работает неправильно.')
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='Artur')
+        self.follower = User.objects.create_user(username='Miniput')
+
+    def test_counters_follow_creation_and_deletion(self):
+        """Stored counters change together with posts, comments, follows."""
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.follower, text='Комментарий')
+        follow = Follow.objects.create(
+            user=self.follower, author=self.author)
+        post.refresh_from_db()
+        self.author.counters.refresh_from_db()
+        self.follower.counters.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.author.counters.posts_count, 1)
+        self.assertEqual(self.author.counters.followers_count, 1)
+        self.assertEqual(self.follower.counters.following_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.author.counters.refresh_from_db()
+        self.follower.counters.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(self.author.counters.followers_count, 0)
+        self.assertEqual(self.follower.counters.following_count, 0)
+        post.delete()
+        self.author.counters.refresh_from_db()
+        self.assertEqual(
+            self.author.counters.posts_count, 0,
+            'Счетчик записей не уменьшается при удалении поста.')
+
+    def test_reconcile_counters_fixes_drift(self):
+        """Command reconcile_counters recounts drifted counters."""
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        Comment.objects.create(
+            post=post, author=self.follower, text='Комментарий')
+        Post.objects.filter(pk=post.pk).update(comment_count=5)
+        UserCounters.objects.filter(user=self.author).update(posts_count=7)
+        UserCounters.objects.filter(user=self.follower).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).posts_count, 1)
+        self.assertTrue(
+            UserCounters.objects.filter(user=self.follower).exists(),
+            'Команда не создает недостающие счетчики.')
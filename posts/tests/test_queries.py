@@ -0,0 +1,163 @@
+import re
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import graph
+from posts.metrics import recorder
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?posts_\w+$')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite')
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='Artur')
+        self.follower = User.objects.create_user(username='Miniput')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        post_list = [Post(
+            text=f'Тестовый пост {number}',
+            author=self.author,
+            group=self.group) for number in range(13)]
+        Post.objects.bulk_create(post_list)
+        self.post = Post.objects.filter(author=self.author).first()
+        Comment.objects.create(
+            post=self.post, author=self.follower, text='Комментарий')
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.client = Client()
+        self.client.force_login(self.follower)
+        self.pages = {
+            'index': reverse('posts:index'),
+            'group_posts': reverse(
+                'posts:group_posts', kwargs={'slug': self.group.slug}),
+            'profile': reverse('posts:profile', kwargs={
+                'username': self.author.username}),
+            'post': reverse('posts:post', kwargs={
+                'username': self.author.username, 'post_id': self.post.pk}),
+            'follow_index': reverse('posts:follow_index'),
+            'post_comments': reverse('posts:post_comments', kwargs={
+                'username': self.author.username, 'post_id': self.post.pk}),
+        }
+
+    def get_bad_plans(self, url):
+        """Return plan steps of the page queries scanning or sorting."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        page = response.context.get('page')
+        next_url = None
+        if getattr(page, 'next_cursor', None):
+            next_url = f'{url}?after={page.next_cursor}'
+        bad_plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    if 'TEMP B-TREE' in detail or FULL_SCAN.match(detail):
+                        bad_plans.append(f'{detail}: {sql}')
+        if next_url:
+            bad_plans.extend(self.get_bad_plans(next_url))
+        return bad_plans
+
+    def check_pages(self):
+        for name, url in self.pages.items():
+            with self.subTest(value=name):
+                self.assertEqual(
+                    self.get_bad_plans(url), [],
+                    f'Запросы страницы "{name}" сканируют таблицу '
+                    'или сортируют без индекса.')
+
+    def test_feed_queries_use_indexes(self):
+        """Numbered pages read posts and comments through indexes."""
+        self.check_pages()
+
+    @override_settings(POSTS_PAGINATION_MODE='cursor')
+    def test_cursor_feed_queries_use_indexes(self):
+        """Cursor pages read posts and comments through indexes."""
+        self.check_pages()
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='Artur')
+        self.follower = User.objects.create_user(username='Miniput')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        post_list = [Post(
+            text=f'Тестовый пост {number}',
+            author=self.author,
+            group=self.group) for number in range(13)]
+        Post.objects.bulk_create(post_list)
+        self.post = Post.objects.filter(author=self.author).first()
+        Comment.objects.create(
+            post=self.post, author=self.follower, text='Комментарий')
+        Follow.objects.create(
+            user=User.objects.create_user(username='Reader'),
+            author=self.author)
+        # The follow graph is loaded once per process, not per request.
+        graph.reset()
+        graph.reload()
+        self.client = Client()
+        self.client.force_login(self.follower)
+        author = {'username': self.author.username}
+        post = {**author, 'post_id': self.post.pk}
+        self.requests = {
+            'posts:index': ('get', reverse('posts:index')),
+            'posts:group_posts': ('get', reverse(
+                'posts:group_posts', kwargs={'slug': self.group.slug})),
+            'posts:profile': ('get', reverse('posts:profile', kwargs=author)),
+            'posts:post': ('get', reverse('posts:post', kwargs=post)),
+            'posts:new_post': ('post', reverse('posts:new_post')),
+            'posts:add_comment': (
+                'post', reverse('posts:add_comment', kwargs=post)),
+            'posts:profile_follow': (
+                'get', reverse('posts:profile_follow', kwargs=author)),
+            'posts:follow_index': ('get', reverse('posts:follow_index')),
+            'posts:profile_unfollow': (
+                'get', reverse('posts:profile_unfollow', kwargs=author)),
+        }
+
+    def test_views_stay_within_query_budgets(self):
+        """Every view with a budget runs no more queries than allowed."""
+        for view_name, (method, url) in self.requests.items():
+            budget = settings.VIEW_QUERY_BUDGETS.get(view_name)
+            if budget is None:
+                continue
+            with self.subTest(value=view_name):
+                response = getattr(self.client, method)(
+                    url, {'text': 'Тестовый текст'} if method == 'post'
+                    else {})
+                self.assertLessEqual(
+                    response.view_metrics['queries'], budget,
+                    f'View {view_name} выполняет больше запросов, '
+                    'чем разрешено в VIEW_QUERY_BUDGETS.')
+
+    def test_metrics_page_shows_percentiles(self):
+        """Staff can see collected per-view percentiles."""
+        recorder.reset()
+        self.client.get(reverse('posts:index'))
+        staff = User.objects.create_user(username='Staff', is_staff=True)
+        self.client.force_login(staff)
+        metrics = self.client.get(reverse('posts:view_metrics')).json()
+        self.assertEqual(metrics['posts:index']['count'], 1)
+        self.assertEqual(
+            set(metrics['posts:index']['queries']), {'p50', 'p95', 'p99'})
@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import resolve, reverse
+
+from posts.models import Post
+from yatube.routers import (PIN_COOKIE, PRIMARY, ReplicaMiddleware,
+                            ReplicaRouter)
+
+User = get_user_model()
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRouterTest(TransactionTestCase):
+    # TestCase would run every test inside a transaction.
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def route(self, request, atomic=False):
+        """Return the databases of a read and a write made by the view."""
+        request.user = AnonymousUser()
+        request.resolver_match = resolve(request.path)
+        seen = []
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            if atomic:
+                with transaction.atomic():
+                    seen.append(self.router.db_for_read(Post))
+            else:
+                seen.append(self.router.db_for_read(Post))
+            seen.append(self.router.db_for_write(Post))
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        middleware(request)
+        return seen
+
+    def test_listed_views_read_from_replica(self):
+        """Reads of the feeds go to a replica, writes to the primary."""
+        self.assertEqual(
+            self.route(self.factory.get(reverse('posts:index'))),
+            ['replica', PRIMARY])
+
+    def test_other_requests_read_from_primary(self):
+        requests = {
+            'unlisted view': self.factory.get(reverse('posts:new_post')),
+            'POST': self.factory.post(reverse('posts:index')),
+        }
+        for name, request in requests.items():
+            with self.subTest(value=name):
+                self.assertEqual(self.route(request), [PRIMARY, PRIMARY])
+
+    def test_pinned_user_reads_from_primary(self):
+        """The pin cookie keeps a user who has written on the primary."""
+        request = self.factory.get(reverse('posts:index'))
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.route(request), [PRIMARY, PRIMARY])
+
+    def test_transactions_read_from_primary(self):
+        request = self.factory.get(reverse('posts:index'))
+        self.assertEqual(
+            self.route(request, atomic=True), [PRIMARY, PRIMARY])
+
+    def test_routing_ends_with_request(self):
+        self.route(self.factory.get(reverse('posts:index')))
+        self.assertEqual(self.router.db_for_read(Post), PRIMARY)
+
+
+class PrimaryPinTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='Artur')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_write_pins_user_to_primary(self):
+        """Requests that change data set the pin cookie, reads don't."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = self.client.post(
+            reverse('posts:new_post'), {'text': 'Новый пост'})
+        self.assertIn(
+            PIN_COOKIE, response.cookies,
+            'После записи пользователь должен читать с основной базы.')
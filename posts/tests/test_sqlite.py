@@ -0,0 +1,34 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite connection settings')
+class SQLitePragmasTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_set_on_connection(self):
+        """Every connection gets the configured pragmas."""
+        self.assertEqual(
+            self.pragma('busy_timeout'),
+            settings.SQLITE_PRAGMAS['busy_timeout'])
+        # 1 is NORMAL.
+        self.assertEqual(self.pragma('synchronous'), 1)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite connection settings')
+class SQLiteTransactionModeTest(TransactionTestCase):
+    # TestCase would turn the transactions into savepoints.
+    def test_transactions_take_write_lock(self):
+        with CaptureQueriesContext(connection) as context:
+            with transaction.atomic():
+                pass
+        self.assertEqual(
+            context.captured_queries[0]['sql'], 'BEGIN IMMEDIATE',
+            'Транзакции должны сразу брать блокировку на запись.')
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (Client, RequestFactory, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from posts.throttle import client_ip, counters
+
+User = get_user_model()
+
+
+@override_settings(WRITE_RATE_LIMITS={
+    'post': {'user': (1, 60)},
+    'comment': {'user': (2, 60), 'ip': (3, 60)},
+})
+class ThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        counters.reset()
+        self.author = User.objects.create_user(username='Artur')
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.author)
+        self.url = reverse('posts:add_comment', kwargs={
+            'username': self.author.username, 'post_id': self.post.pk})
+
+    def comment(self, user, address='127.0.0.1'):
+        client = Client(REMOTE_ADDR=address)
+        client.force_login(user)
+        return client.post(self.url, {'text': 'Комментарий'})
+
+    def test_user_over_limit_gets_429(self):
+        """Requests over the burst are rejected with Retry-After."""
+        for _ in range(2):
+            self.assertEqual(self.comment(self.author).status_code, 302)
+        response = self.comment(self.author)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(
+            Comment.objects.count(), 2,
+            'Отклоненный запрос не должен создавать комментарий.')
+        self.assertEqual(
+            counters.summary(),
+            {'comment': {'admitted': 2, 'rejected': 1}})
+
+    def test_ip_bucket_is_shared_by_users(self):
+        users = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(4)]
+        statuses = [
+            self.comment(user, '10.0.0.1').status_code for user in users]
+        self.assertEqual(statuses, [302, 302, 302, 429])
+
+    def test_internal_ips_have_no_ip_bucket(self):
+        users = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(4)]
+        statuses = [self.comment(user).status_code for user in users]
+        self.assertEqual(statuses, [302] * 4)
+
+    def test_forms_are_not_limited(self):
+        client = Client()
+        client.force_login(self.author)
+        for _ in range(3):
+            self.assertEqual(
+                client.get(reverse('posts:new_post')).status_code, 200)
+
+
+class ClientIpTest(TestCase):
+    def test_forwarded_address_is_trusted_from_proxy_only(self):
+        factory = RequestFactory()
+        proxied = factory.get(
+            '/', REMOTE_ADDR='127.0.0.1',
+            HTTP_X_FORWARDED_FOR='1.2.3.4, 10.0.0.7')
+        direct = factory.get(
+            '/', REMOTE_ADDR='10.0.0.8', HTTP_X_FORWARDED_FOR='1.2.3.4')
+        self.assertEqual(client_ip(proxied), '10.0.0.7')
+        self.assertEqual(client_ip(direct), '10.0.0.8')
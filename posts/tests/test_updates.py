@@ -0,0 +1,109 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts import updates
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class HubTest(TestCase):
+    def setUp(self):
+        self.hub = updates.Hub()
+
+    def test_wait_returns_matching_posts(self):
+        """Only posts of the feed after the cursor are returned."""
+        for event in ((4, 1, None), (5, 1, None), (6, 2, None)):
+            self.hub.publish(updates.Event(*event))
+        ids = self.hub.wait(
+            4, lambda event: event.author_id == 1, timeout=0)
+        self.assertEqual(ids, [5])
+
+    def test_publish_wakes_waiting_request(self):
+        publisher = threading.Timer(
+            0.05, self.hub.publish, (updates.Event(7, 1, None),))
+        publisher.start()
+        start = time.monotonic()
+        ids = self.hub.wait(6, lambda event: True, timeout=5)
+        publisher.join()
+        self.assertEqual(ids, [7])
+        self.assertLess(
+            time.monotonic() - start, 1,
+            'Ожидание должно прерываться новой записью.')
+
+    def test_wait_is_refused_when_hub_is_full(self):
+        waiter = threading.Thread(
+            target=self.hub.wait, args=(0, lambda event: True, 5))
+        waiter.start()
+        while not self.hub.waiting:
+            time.sleep(0.01)
+        start = time.monotonic()
+        self.assertIsNone(
+            self.hub.wait(0, lambda event: True, 5, max_waiting=1))
+        self.assertLess(time.monotonic() - start, 1)
+        self.hub.publish(updates.Event(1, 1, None))
+        waiter.join()
+        self.assertEqual(self.hub.waiting, 0)
+
+
+@override_settings(UPDATES_TIMEOUT=0)
+class FeedUpdatesTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='Artur')
+        self.reader = User.objects.create_user(username='Miniput')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание')
+        self.first = Post.objects.create(
+            text='Первый пост', author=self.author, group=self.group)
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.url = reverse('posts:feed_updates')
+
+    def test_first_request_returns_cursor(self):
+        response = self.client.get(self.url, {'feed': 'index'})
+        self.assertEqual(
+            response.json(), {'posts': [], 'cursor': self.first.pk})
+
+    def test_new_posts_of_feed_after_cursor(self):
+        in_group = Post.objects.create(
+            text='В группе', author=self.author, group=self.group)
+        Post.objects.create(text='Без группы', author=self.reader)
+        response = self.client.get(self.url, {
+            'feed': 'group', 'slug': self.group.slug,
+            'after': self.first.pk})
+        self.assertEqual(
+            response.json(), {'posts': [in_group.pk], 'cursor': in_group.pk},
+            'В ответе должны быть только новые записи группы.')
+
+    def test_follow_feed(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(
+            self.url, {'feed': 'follow', 'after': self.first.pk})
+        self.assertEqual(response.json()['posts'], [post.pk])
+        response = Client().get(self.url, {'feed': 'follow'})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(
+        UPDATES_TIMEOUT=25, UPDATES_MAX_WAITING=0, UPDATES_RETRY_AFTER=7)
+    def test_poll_is_answered_at_once_when_waiters_are_full(self):
+        response = self.client.get(
+            self.url, {'feed': 'index', 'after': self.first.pk})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Retry-After'], '7')
+
+
+class AnnounceTest(TransactionTestCase):
+    # The hub hears of posts when their transaction commits.
+    def test_new_post_is_announced(self):
+        author = User.objects.create_user(username='Artur')
+        post = Post.objects.create(text='Новый пост', author=author)
+        self.assertIn(
+            post.pk,
+            updates.hub.wait(post.pk - 1, lambda event: True, timeout=0))
@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 
 from posts.models import Group, Post
+from users.forms import CreationForm
 
 User = get_user_model()
 
@@ -123,3 +124,21 @@ class PostURLTests(TestCase):
         response = authorised_not_post_client.get(
             self.project_page['post_edit'])
         self.assertRedirects(response, redirect_page)
+
+    def test_page_addresses_are_not_usernames(self):
+        """Signup refuses usernames whose profile a page would shadow."""
+        for username in ('search', 'updates', 'export', 'internal', 'new',
+                         'follow', 'admin', 'auth'):
+            with self.subTest(username=username):
+                form = CreationForm(data={
+                    'username': username,
+                    'password1': 'Yatube-password-1',
+                    'password2': 'Yatube-password-1'})
+                self.assertIn(
+                    'username', form.errors,
+                    f'Имя {username} перекрыто адресом страницы.')
+        form = CreationForm(data={
+            'username': 'searcher',
+            'password1': 'Yatube-password-1',
+            'password2': 'Yatube-password-1'})
+        self.assertTrue(form.is_valid(), form.errors)
@@ -1,34 +1,45 @@
+import io
+import json
 import shutil
 import tempfile
+import threading
+import zipfile
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.template.loader import render_to_string
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
 
-from posts.models import Comment, Follow, Group, Post
+from posts import cache, thumbnails
+from posts.models import (Comment, Follow, Group, Post, PostImageVariant,
+                          TimelineEntry)
+from posts.pagination import CursorPaginator, encode_cursor
+from posts.search import search_page
 
 User = get_user_model()
 
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
 
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
         settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
         cls.uploaded = SimpleUploadedFile(
             name='small.gif',
-            content=small_gif,
+            content=SMALL_GIF,
             content_type='image/gif'
         )
 
@@ -214,14 +225,62 @@ class PostPagesTests(TestCase):
         """Index page cache exist."""
         cache_page = self.project_page['index']
         cache_content = self.authorized_client.get(cache_page).content
-        Post.objects.create(
-            text='Пост для проверки кеша',
-            author=self.author)
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Изменение в обход сигналов')
         new_content = self.authorized_client.get(cache_page).content
         self.assertEqual(
             cache_content, new_content,
             f'Страница "{cache_page}" не кешируется.')
 
+    def test_cache_pages_invalidated_by_changes(self):
+        """Cached feed pages show a new post and a new comment at once."""
+        pages = (
+            self.project_page['index'],
+            self.project_page['group_posts'],
+            self.project_page['profile'],
+        )
+        for page in pages:
+            self.authorized_client.get(page)
+        new_post = Post.objects.create(
+            text='Пост для проверки кеша',
+            author=self.author,
+            group=self.group)
+        for page in pages:
+            with self.subTest(value=page):
+                content = self.authorized_client.get(page).content.decode()
+                self.assertIn(
+                    new_post.text, content,
+                    f'Кеш страницы "{page}" не сбрасывается новым постом.')
+        Comment.objects.create(
+            post=new_post, author=self.follower, text='Комментарий')
+        content = self.authorized_client.get(pages[0]).content.decode()
+        self.assertIn(
+            'Комментариев: 1', content,
+            'Кеш главной страницы не сбрасывается новым комментарием.')
+
+    def test_post_image_thumbnail_is_pregenerated(self):
+        """Pages show a placeholder until the thumbnail is generated."""
+        post_page = self.project_page['post']
+        content = self.authorized_client.get(post_page).content.decode()
+        self.assertNotIn(
+            '<img class="card-img"', content,
+            'Миниатюра создается во время отрисовки страницы.')
+        thumbnails.generate(self.post.image.name)
+        content = self.authorized_client.get(post_page).content.decode()
+        self.assertIn(
+            '<img class="card-img"', content,
+            'Готовая миниатюра не выводится на странице поста.')
+
+    def test_post_image_variants_are_offered_by_srcset(self):
+        """Generated WebP and JPEG variants get to the srcset."""
+        thumbnails.generate(self.post.image.name, self.post.pk)
+        formats = set(PostImageVariant.objects.filter(
+            post=self.post).values_list('format', flat=True))
+        self.assertEqual(formats, {'webp', 'jpg'})
+        content = self.authorized_client.get(
+            self.project_page['index']).content.decode()
+        self.assertIn('type="image/webp" srcset="', content)
+
     def test_authorized_user_can_subscribe_other_users(self):
         """Authorized user can subscribe another users."""
         follow_page = self.project_page['profile_follow']
@@ -246,6 +305,29 @@ class PostPagesTests(TestCase):
             'Нельзя отписаться от автора, страница'
             f' "{unfollow_page}" работает некорректно.')
 
+    def test_follow_page_timeline_follows_posts_and_subscriptions(self):
+        """
+        Timeline gets old posts on subscribe, new posts on publish
+        and loses them on delete and unsubscribe.
+        """
+        follow_page = self.project_page['follow_index']
+        self.follower_client.get(self.project_page['profile_follow'])
+        new_post = Post.objects.create(
+            text='Новый пост автора', author=self.author)
+        response = self.follower_client.get(follow_page)
+        self.assertEqual(
+            list(response.context['page']), [new_post, self.post],
+            'Лента подписчика не содержит посты автора.')
+        new_post.delete()
+        response = self.follower_client.get(follow_page)
+        self.assertEqual(
+            list(response.context['page']), [self.post],
+            'Удаленный пост остался в ленте подписчика.')
+        self.follower_client.get(self.project_page['profile_unfollow'])
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists(),
+            'После отписки посты автора остались в ленте.')
+
     def test_anonymous_user_can_not_comment_post(self):
         """Anonymous user can't comment post."""
         comment_url = self.project_page['add_comment']
@@ -284,6 +366,15 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(post_list)
         self.client = Client()
 
+    def test_cache_differs_between_pages(self):
+        """Every page of the index has its own cached fragment."""
+        index_url = reverse('posts:index')
+        first_page = self.client.get(index_url).content
+        second_page = self.client.get(index_url + '?page=2').content
+        self.assertNotEqual(
+            first_page, second_page,
+            'Вторая страница показывает закешированную первую.')
+
     def test_paginator_correctly_deviding_posts(self):
         """First page contain 10 posts, second page contain 3 posts."""
         pages = {
@@ -299,3 +390,431 @@ class PaginatorViewsTest(TestCase):
                     posts_per_page,
                     'Паджинатор работает неправильно, на странице '
                     f'должно быть {posts_per_page} постов.')
+
+
+@override_settings(POSTS_PAGINATION_MODE='cursor')
+class CursorPaginatorViewsTest(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='Artur')
+        post_list = [Post(
+            text=f'Тестовый пост {number}',
+            author=author) for number in range(13)]
+        Post.objects.bulk_create(post_list)
+        self.client = Client()
+
+    def test_cursor_paginator_walks_feed_both_ways(self):
+        """Cursor pages follow each other without gaps and repeats."""
+        index_url = reverse('posts:index')
+        first_page = self.client.get(index_url).context['page']
+        self.assertEqual(
+            len(first_page), 10,
+            'На первой странице должно быть 10 постов.')
+        self.assertFalse(first_page.has_previous())
+        second_page = self.client.get(
+            index_url, {'after': first_page.next_cursor}).context['page']
+        self.assertEqual(
+            len(second_page), 3,
+            'На второй странице должно быть 3 поста.')
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            {post.pk for post in first_page} | {
+                post.pk for post in second_page},
+            set(Post.objects.values_list('pk', flat=True)),
+            'Курсорный паджинатор теряет или повторяет посты.')
+        previous_page = self.client.get(
+            index_url, {'before': second_page.previous_cursor}
+        ).context['page']
+        self.assertEqual(
+            list(previous_page), list(first_page),
+            'Ссылка "Предыдущая" ведет не на первую страницу.')
+
+    def test_page_is_fetched_with_one_query(self):
+        """The row after the page replaces the queries for neighbours."""
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        with self.assertNumQueries(1):
+            first_page = paginator.page()
+            self.assertEqual(len(list(first_page.object_list)), 5)
+            self.assertTrue(first_page.has_next())
+        second_page = paginator.page(after=first_page.next_cursor)
+        with self.assertNumQueries(1):
+            last_page = paginator.page(after=second_page.next_cursor)
+            self.assertEqual(len(last_page), 3)
+            self.assertFalse(last_page.has_next())
+        with self.assertNumQueries(1):
+            previous_page = paginator.page(before=last_page.previous_cursor)
+            self.assertEqual(list(previous_page), list(second_page))
+            self.assertTrue(previous_page.has_previous())
+
+    def test_single_page_has_no_navigation(self):
+        page = CursorPaginator(Post.objects.all(), 20).page()
+        self.assertNotIn(
+            '<nav>', render_to_string(
+                'includes/paginator.html', {'page': page}),
+            'Для одной страницы навигация не нужна.')
+
+    def test_broken_cursor_shows_first_page(self):
+        """Undecodable cursor falls back to the first page."""
+        response = self.client.get(
+            reverse('posts:index'), {'after': 'broken'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), 10)
+
+    def test_mistyped_cursor_shows_first_page(self):
+        """Well-formed cursor with values of the wrong type is rejected."""
+        for values in ([1, 2], ['2019-01-01T00:00:00', '1'], [True, 1]):
+            with self.subTest(values=values):
+                response = self.client.get(
+                    reverse('posts:index'), {'after': encode_cursor(values)})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['page']), 10)
+
+
+class CommentPaginationTest(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='Artur')
+        self.post = Post.objects.create(text='Тестовый пост', author=author)
+        commenters = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(3)]
+        for number in range(25):
+            Comment.objects.create(
+                post=self.post, author=commenters[number % 3],
+                text=f'Комментарий {number}')
+        kwargs = {'username': author.username, 'post_id': self.post.pk}
+        self.post_url = reverse('posts:post', kwargs=kwargs)
+        self.fragment_url = reverse('posts:post_comments', kwargs=kwargs)
+        self.client = Client()
+
+    def test_post_page_shows_first_comments(self):
+        """The post page shows one page of comments, newest first."""
+        response = self.client.get(self.post_url)
+        comments = list(response.context['comments_page'])
+        self.assertEqual(
+            len(comments), settings.COMMENTS_PER_PAGE,
+            'На странице поста должна быть одна страница комментариев.')
+        self.assertEqual(comments[0].text, 'Комментарий 24')
+        self.assertContains(response, self.fragment_url)
+
+    def test_comment_authors_are_joined(self):
+        """Comment authors don't cost a query per comment."""
+        response = self.client.get(self.post_url)
+        with self.assertNumQueries(0):
+            for comment in response.context['comments_page']:
+                comment.author.username
+
+    def test_fragment_loads_the_rest(self):
+        """The fragment continues after the cursor and stops at the end."""
+        page = self.client.get(self.post_url).context['comments_page']
+        response = self.client.get(
+            self.fragment_url, {'after': page.next_cursor})
+        self.assertEqual(response.status_code, 200)
+        texts = [
+            comment.text for comment in response.context['comments_page']]
+        self.assertEqual(
+            texts, [f'Комментарий {number}' for number in range(4, -1, -1)],
+            'Фрагмент должен продолжать список комментариев.')
+        self.assertNotContains(response, 'js-more-comments')
+        self.assertNotContains(response, '<html')
+
+
+class PostCardCacheTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='Artur')
+        self.reader = User.objects.create_user(username='Miniput')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.post = Post.objects.create(
+            text='Текст карточки', author=self.author)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.edit_url = reverse('posts:post_edit', kwargs={
+            'username': self.author.username, 'post_id': self.post.pk})
+
+    def test_cards_are_rendered_once(self):
+        """A listing shown again is assembled from cached cards."""
+        feed_url = reverse('posts:follow_index')
+        response = self.reader_client.get(feed_url)
+        self.assertTemplateUsed(response, 'includes/post_item.html')
+        response = self.reader_client.get(feed_url)
+        self.assertTemplateNotUsed(response, 'includes/post_item.html')
+        self.assertContains(response, 'Текст карточки')
+
+    def test_changes_move_post_to_new_version(self):
+        """Edits and comments change the cached card."""
+        version = self.post.version
+        self.author_client.post(self.edit_url, {'text': 'Новый текст'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, version + 1)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, version + 2)
+        content = self.reader_client.get(
+            reverse('posts:follow_index')).content.decode()
+        self.assertIn('Новый текст', content)
+        self.assertIn('Комментариев: 1', content)
+
+    def test_renames_move_posts_to_new_version(self):
+        """Cards show the new username and group title after a rename."""
+        group = Group.objects.create(title='Старое название', slug='group')
+        self.post.group = group
+        self.post.save()
+        feed_url = reverse('posts:follow_index')
+        self.assertContains(
+            self.reader_client.get(feed_url), 'Старое название')
+        group.title = 'Новое название'
+        group.save()
+        self.author.username = 'Arturo'
+        self.author.save()
+        response = self.reader_client.get(feed_url)
+        self.assertContains(response, 'Новое название')
+        self.assertContains(response, '@Arturo')
+        self.assertNotContains(response, '@Artur<')
+
+    def test_renames_reach_cached_feeds(self):
+        """Cached feed pages and post pages follow renames too."""
+        group = Group.objects.create(title='Старое название', slug='group')
+        self.post.group = group
+        self.post.save()
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        post_url = reverse('posts:post', kwargs={
+            'username': self.author.username, 'post_id': self.post.pk})
+        urls = [reverse('posts:index'), reverse(
+            'posts:profile', kwargs={'username': self.author.username})]
+        for url in urls:
+            self.assertContains(self.reader_client.get(url), 'Старое название')
+        guest_client = Client()
+        etag = guest_client.get(post_url)['ETag']
+        group.title = 'Новое название'
+        group.save()
+        self.reader.username = 'Minipoot'
+        self.reader.save()
+        for url in urls:
+            self.assertContains(self.reader_client.get(url), 'Новое название')
+        response = guest_client.get(post_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '@Minipoot')
+
+    def test_edit_button_is_kept_out_of_cache(self):
+        """Only the author sees the edit button on a shared card."""
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': self.author.username})
+        self.assertNotContains(
+            self.reader_client.get(profile_url), self.edit_url)
+        self.assertContains(self.author_client.get(profile_url), self.edit_url)
+        self.assertNotContains(
+            self.reader_client.get(profile_url), self.edit_url)
+
+    def test_cached_feed_page_is_shared_by_viewers(self):
+        """A cached page serves every viewer without the page queries."""
+        index_url = reverse('posts:index')
+        self.assertIn('page', self.reader_client.get(index_url).context)
+        response = self.author_client.get(index_url)
+        self.assertNotIn('page', response.context)
+        self.assertContains(response, 'Текст карточки')
+        self.assertContains(response, self.edit_url)
+
+
+class SearchViewsTest(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='Artur')
+        self.post = Post.objects.create(
+            text='Рецепт яблочного пирога', author=author)
+        Post.objects.create(text='Заметки о погоде', author=author)
+        Post.objects.bulk_create([Post(
+            text=f'Пирог номер {number}',
+            author=author) for number in range(12)])
+        self.client = Client()
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:search'), {'q': query, **params}).context['page']
+
+    def test_search_finds_matching_posts(self):
+        """Search returns only the posts containing the words."""
+        page = self.search('яблочного пирога')
+        self.assertEqual(
+            [post.pk for post in page], [self.post.pk],
+            'Поиск находит не те посты.')
+
+    def test_search_follows_edits(self):
+        """Edited text is found by the new words only."""
+        self.post.text = 'Рецепт вишневого штруделя'
+        self.post.save()
+        self.assertEqual(len(self.search('яблочного')), 0)
+        self.assertEqual(len(self.search('штруделя')), 1)
+
+    def test_search_pages(self):
+        """Ranked results are paginated without repeats."""
+        first_page = self.search('пирог')
+        self.assertEqual(len(first_page), 10)
+        self.assertTrue(first_page.has_next())
+        self.assertFalse(first_page.has_previous())
+        second_page = self.search('пирог', after=first_page.next_cursor)
+        self.assertEqual(len(second_page), 2)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        self.assertFalse(
+            {post.pk for post in first_page}
+            & {post.pk for post in second_page},
+            'Страницы результатов поиска повторяют посты.')
+        previous_page = self.search(
+            'пирог', before=second_page.previous_cursor)
+        self.assertEqual(
+            [post.pk for post in previous_page],
+            [post.pk for post in first_page])
+        self.assertFalse(previous_page.has_previous())
+
+    def test_search_page_queries(self):
+        """A page of results is one match query and the posts."""
+        first_page = search_page('пирог')
+        # The matches, the posts with authors and groups, their images.
+        with self.assertNumQueries(3):
+            search_page('пирог', after=first_page.next_cursor)
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='Artur')
+        self.follower = User.objects.create_user(username='Miniput')
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.author)
+        self.client = Client()
+        self.client.force_login(self.follower)
+
+    def revalidate(self, url):
+        etag = self.client.get(url)['ETag']
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_are_not_modified(self):
+        """Repeated requests of unchanged pages get 304 without render."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'Artur'}),
+            reverse('posts:post', kwargs={
+                'username': 'Artur', 'post_id': self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(value=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_changes_invalidate_etag(self):
+        """New posts and follows make the pages render again."""
+        index_url = reverse('posts:index')
+        etag = self.client.get(index_url)['ETag']
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(index_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        profile_url = reverse('posts:profile', kwargs={'username': 'Artur'})
+        etag = self.client.get(profile_url)['ETag']
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'Artur'}))
+        response = self.client.get(profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['subscribe'])
+
+    def test_rename_invalidates_etag(self):
+        """The index renders again when an author shown on it is renamed."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        self.author.username = 'Arturo'
+        self.author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, '@Arturo')
+
+    def test_etag_depends_on_viewer(self):
+        """Another user doesn't get the page rendered for the first one."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        self.client.logout()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(POST_THUMBNAIL_WORKERS=1)
+class ThumbnailWorkerTest(TransactionTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = self.settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        # A pool of this test only, so it can be waited for.
+        thumbnails._executor = None
+        self.addCleanup(setattr, thumbnails, '_executor', None)
+        self.author = User.objects.create_user(username='Artur')
+        self.group = Group.objects.create(title='Тестовая группа', slug='g')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_generated_thumbnails_invalidate_feeds(self):
+        """Feeds rendered with a placeholder are dropped by the worker."""
+        executor = thumbnails._get_executor()
+        # The worker waits until the feeds are rendered.
+        rendered = threading.Event()
+        executor.submit(rendered.wait, 10)
+        self.client.post(reverse('posts:new_post'), {
+            'text': 'Пост с картинкой', 'group': self.group.pk,
+            'image': SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif')})
+        post = Post.objects.get()
+        scopes = cache.post_scopes(self.author.pk, self.group.pk)
+        versions = cache.get_versions(*scopes)
+        rendered.set()
+        executor.shutdown(wait=True)
+        self.assertTrue(PostImageVariant.objects.filter(post=post).exists())
+        self.assertEqual(
+            Post.objects.get().version, post.version + 1,
+            'Готовая миниатюра не меняет версию карточки поста.')
+        for scope, old, new in zip(
+                scopes, versions, cache.get_versions(*scopes)):
+            self.assertNotEqual(
+                old, new,
+                f'Готовая миниатюра не сбрасывает кеш ленты {scope}.')
+
+
+class ExportViewTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        # override_settings, unlike assignment, resets the cached
+        # storage location on both ends.
+        media_settings = self.settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.author = User.objects.create_user(username='Artur')
+        other = User.objects.create_user(username='Miniput')
+        self.post = Post.objects.create(
+            text='Пост с картинкой', author=self.author,
+            image=SimpleUploadedFile(
+                'small.gif', b'GIF89a-not-really', content_type='image/gif'))
+        Post.objects.create(text='Чужой пост', author=other)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Мой комментарий')
+        self.client = Client()
+
+    def test_export_streams_user_data(self):
+        """The archive holds only the user's posts, comments and images."""
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('posts:export_data'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content)))
+        posts = json.loads(archive.read('posts.json'))
+        self.assertEqual([post['text'] for post in posts],
+                         ['Пост с картинкой'])
+        comments = json.loads(archive.read('comments.json'))
+        self.assertEqual(comments[0]['post'], self.post.pk)
+        self.assertEqual(
+            archive.read(posts[0]['image']), b'GIF89a-not-really')
+
+    def test_export_requires_login(self):
+        response = self.client.get(reverse('posts:export_data'))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,123 @@
+"""
+Admission control of the write views.
+
+Every write takes the SQLite write lock, so a client flooding them
+slows everyone down. The views of a scope share token buckets, one per
+user and one per client IP, kept in the cache: a bucket holds up to
+`burst` requests and refills at `burst` per `seconds`, as configured in
+WRITE_RATE_LIMITS. Requests finding a bucket empty get 429 with
+Retry-After before the view opens its transaction. Buckets are read and
+written without a lock, concurrent requests of one client may get
+a few requests more than the limit.
+
+INTERNAL_IPS have no IP buckets, behind RATE_LIMIT_PROXIES the client
+IP is taken from X-Forwarded-For.
+"""
+import math
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+BUCKET_KEY = 'rate:{}:{}:{}'
+
+
+class ThrottleCounters:
+    """Admitted and rejected requests per scope in this process."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, scope, outcome):
+        with self._lock:
+            self._counts[scope, outcome] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+    def summary(self):
+        with self._lock:
+            counts = dict(self._counts)
+        result = {}
+        for (scope, outcome), count in sorted(counts.items()):
+            result.setdefault(scope, {'admitted': 0, 'rejected': 0})
+            result[scope][outcome] = count
+        return result
+
+
+counters = ThrottleCounters()
+
+
+def client_ip(request):
+    address = request.META.get('REMOTE_ADDR', '')
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded and address in settings.RATE_LIMIT_PROXIES:
+        # The last address is the one added by our proxy.
+        return forwarded.split(',')[-1].strip()
+    return address
+
+
+def _identities(request):
+    identities = {}
+    if request.user.is_authenticated:
+        identities['user'] = request.user.pk
+    address = client_ip(request)
+    if address not in settings.INTERNAL_IPS:
+        identities['ip'] = address
+    return identities
+
+
+def take(scope, request):
+    """
+    Take a token from every bucket of the request in the scope. Return
+    0 when the request is admitted, otherwise seconds until it would be.
+    """
+    limits = settings.WRITE_RATE_LIMITS.get(scope, {})
+    keys = {
+        kind: BUCKET_KEY.format(scope, kind, identity)
+        for kind, identity in _identities(request).items()
+        if kind in limits}
+    if not keys:
+        return 0
+    now = time.time()
+    stored = cache.get_many(list(keys.values()))
+    buckets = {}
+    wait = 0
+    for kind, key in keys.items():
+        burst, seconds = limits[kind]
+        rate = burst / seconds
+        tokens, updated = stored.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) / rate)
+        buckets[key] = (tokens - 1, now)
+    if wait:
+        return wait
+    # A bucket left alone for its period is full again, same as missing.
+    cache.set_many(buckets, max(seconds for _, seconds in limits.values()))
+    return 0
+
+
+def throttle(scope, methods=('POST',)):
+    """Limit the requests of the view made with the methods."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return view(request, *args, **kwargs)
+            wait = take(scope, request)
+            if wait:
+                counters.add(scope, 'rejected')
+                response = render(request, 'misc/429.html', status=429)
+                response['Retry-After'] = str(math.ceil(wait))
+                return response
+            counters.add(scope, 'admitted')
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
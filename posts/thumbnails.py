@@ -0,0 +1,116 @@
+"""
+Thumbnails of post images, generated off the request path.
+
+Uploads enqueue every configured thumbnail and the responsive variants
+to a local thread pool once the post is committed. Templates only look
+thumbnails up in the sorl key-value store and show a placeholder while
+they are not ready, so a page render never decodes or resizes an image.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import cache, variants
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+class PregeneratedThumbnailBackend(ThumbnailBackend):
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """
+        Return the thumbnail if it was generated already, else None.
+        Options are completed the same way get_thumbnail does, so both
+        agree on the thumbnail name.
+        """
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = PregeneratedThumbnailBackend()
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def get_ready_thumbnail(file_, alias):
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    return backend.get_ready_thumbnail(file_, geometry, **options)
+
+
+def generate(name, post_id=None):
+    """Create all configured thumbnails and variants of the image."""
+    try:
+        for geometry, options in settings.POST_THUMBNAILS.values():
+            backend.get_thumbnail(name, geometry, **options)
+        if post_id is not None:
+            variants.generate(post_id)
+            # Cards and feed pages rendered while the image was
+            # processed show a placeholder.
+            posts = Post.objects.filter(pk=post_id)
+            posts.update(version=F('version') + 1)
+            ids = posts.values_list('author_id', 'group_id').first()
+            if ids is not None:
+                cache.bump(*cache.post_scopes(*ids))
+    except Exception:
+        logger.exception('Thumbnails of %s are not generated', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def _generate_in_worker(name, post_id):
+    try:
+        generate(name, post_id)
+    finally:
+        # Worker threads open their own connections, nobody else
+        # would close them.
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POST_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+        return _executor
+
+
+def enqueue(name, post_id=None):
+    """Generate thumbnails of the image in the worker pool once."""
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    if not settings.POST_THUMBNAIL_WORKERS:
+        generate(name, post_id)
+        return
+    _get_executor().submit(_generate_in_worker, name, post_id)
+
+
+def enqueue_post(post):
+    """Enqueue thumbnails of the post image after the commit."""
+    if post.image:
+        name, post_id = post.image.name, post.pk
+        transaction.on_commit(lambda: enqueue(name, post_id))
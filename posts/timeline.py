@@ -0,0 +1,72 @@
+"""
+Materialized follow feed.
+
+Every post is copied into the timeline of each follower when it is
+published, so the follow page reads one user's rows from a single index
+instead of joining Follow and Post over the whole history.
+"""
+from collections import defaultdict
+
+from django.db.models import F
+
+from .models import Follow, Post, TimelineEntry
+
+BATCH_SIZE = 1000
+
+FEED_ORDERING = ('-timeline_date', '-timeline_post')
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Deliver a new post to the timelines of the author's followers."""
+    fan_out_many([post])
+
+
+def fan_out_many(posts):
+    """Deliver a batch of new posts to the timelines of the followers."""
+    posts_by_author = defaultdict(list)
+    for post in posts:
+        posts_by_author[post.author_id].append(post)
+    follows = Follow.objects.filter(
+        author_id__in=list(posts_by_author)).values_list(
+        'author_id', 'user_id')
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      pub_date=post.pub_date)
+        for author_id, user_id in follows.iterator()
+        for post in posts_by_author[author_id])
+
+
+def backfill(user_id, author_id):
+    """Copy existing posts of the author into the user's timeline."""
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator())
+
+
+def prune(user_id, author_id):
+    """Remove posts of the author from the user's timeline."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def feed_for(user):
+    """Posts of the user's timeline, newest first."""
+    posts = Post.objects.select_related(
+        'author', 'group').prefetch_related('image_variants')
+    return posts.filter(timeline_entries__user=user).annotate(
+        timeline_date=F('timeline_entries__pub_date'),
+        timeline_post=F('timeline_entries__post'),
+    )
@@ -0,0 +1,98 @@
+"""
+Live "new posts" updates of the feeds.
+
+Open feed pages long-poll feed_updates with the id of the newest post
+they know. New posts are announced to an in-memory hub of the process
+when their transaction commits, and waiting requests are woken by the
+posts of their feed, so an idle page costs one indexed query per
+UPDATES_TIMEOUT instead of reloading the feed. The query at the start
+of every poll catches up with the posts published before it and in
+other processes, which the hub of this process never hears about.
+
+Waiting requests hold a worker thread each, so at most
+UPDATES_MAX_WAITING of them wait in a process. Polls finding every
+slot taken are answered at once with 204 and ask again after
+UPDATES_RETRY_AFTER seconds.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.db import transaction
+
+# Posts kept by the hub for requests that start waiting right after
+# a post was announced.
+HUB_SIZE = 1000
+
+MAX_IDS = 100
+
+Event = namedtuple('Event', 'post_id author_id group_id')
+
+
+class Hub:
+    def __init__(self, size=HUB_SIZE):
+        self._events = deque(maxlen=size)
+        self._condition = threading.Condition()
+        self.waiting = 0
+
+    def publish(self, event):
+        with self._condition:
+            self._events.append(event)
+            self._condition.notify_all()
+
+    def _matching(self, after, matches):
+        return sorted(
+            event.post_id for event in self._events
+            if event.post_id > after and matches(event))[:MAX_IDS]
+
+    def wait(self, after, matches, timeout, max_waiting=None):
+        """
+        Return ids of the announced posts after the cursor accepted by
+        matches, waiting up to timeout seconds for the first of them.
+        Return None at once when max_waiting requests wait already.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            ids = self._matching(after, matches)
+            if ids or timeout <= 0:
+                return ids
+            if max_waiting is not None and self.waiting >= max_waiting:
+                return None
+            self.waiting += 1
+            try:
+                while not ids:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                    ids = self._matching(after, matches)
+            finally:
+                self.waiting -= 1
+            return ids
+
+
+hub = Hub()
+
+
+def announce(post):
+    """Wake the requests waiting for the post once it is committed."""
+    event = Event(post.pk, post.author_id, post.group_id)
+    transaction.on_commit(lambda: hub.publish(event))
+
+
+def new_posts(queryset, matches, after, timeout, max_waiting=None):
+    """
+    Return the ids of the posts of the feed after the cursor and the
+    new cursor. Without a cursor only the cursor of the newest post is
+    returned, the page starts polling from it. The ids are None when
+    max_waiting requests wait already.
+    """
+    posts = queryset.order_by('pk').values_list('pk', flat=True)
+    if after is None:
+        return [], posts.reverse().first() or 0
+    ids = list(posts.filter(pk__gt=after)[:MAX_IDS])
+    if not ids and timeout:
+        ids = hub.wait(after, matches, timeout, max_waiting)
+        if ids is None:
+            return None, after
+    return ids, ids[-1] if ids else after
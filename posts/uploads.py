@@ -0,0 +1,75 @@
+"""
+Ingestion of uploaded post images.
+
+Uploads are streamed to temporary files by the upload handlers. Here
+their size and dimensions are checked from the file header before any
+pixel data is decoded, and images bigger than the configured master
+size are downscaled, so stored originals stay small and cheap to
+thumbnail.
+"""
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageOps
+
+# Formats stored as uploaded when they fit the limits.
+KEPT_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+EXIF_ORIENTATION = 0x0112
+
+
+def _needs_rotation(image):
+    try:
+        return image.getexif().get(EXIF_ORIENTATION, 1) != 1
+    except (AttributeError, SyntaxError, ValueError):
+        return False
+
+
+def normalize_image(upload):
+    """
+    Validate the uploaded image and return the file to store:
+    the upload itself or its downscaled copy, which the caller closes.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл слишком большой, максимальный размер %(size)s МБ.',
+            code='file_too_large',
+            params={'size': settings.POST_IMAGE_MAX_UPLOAD_SIZE >> 20})
+    upload.seek(0)
+    # Image.open reads the header only, the pixels aren't decoded yet.
+    image = Image.open(upload)
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Изображение слишком большое: %(width)s×%(height)s точек.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height})
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    if (image.format in KEPT_FORMATS and max(width, height) <= max_side
+            and not _needs_rotation(image)):
+        upload.seek(0)
+        return upload
+    # JPEG can be decoded right at a reduced scale, which bounds the
+    # memory taken by the pixels.
+    image.draft('RGB', (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image_format, extension, content_type = 'PNG', 'png', 'image/png'
+    else:
+        image_format, extension, content_type = 'JPEG', 'jpg', 'image/jpeg'
+        image = image.convert('RGB')
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    master = TemporaryUploadedFile(
+        f'{stem}.{extension}', content_type, 0, None)
+    try:
+        image.save(
+            master, image_format, quality=settings.POST_IMAGE_QUALITY)
+    except Exception:
+        master.close()
+        raise
+    master.size = master.tell()
+    master.seek(0)
+    return master
@@ -8,13 +8,23 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
     path('new/', views.new_post, name='new_post'),
+    path('search/', views.search, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('updates/', views.feed_updates, name='feed_updates'),
+    path('export/', views.export_data, name='export_data'),
+    path('internal/metrics/', views.view_metrics, name='view_metrics'),
+    path('internal/cache/', views.cache_stats, name='cache_stats'),
+    path('internal/throttle/', views.throttle_stats, name='throttle_stats'),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path(
         '<str:username>/<int:post_id>/edit/',
         views.post_edit,
         name='post_edit'),
+    path(
+        '<str:username>/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'),
     path(
         '<str:username>/<int:post_id>/comment/',
         views.add_comment,
@@ -0,0 +1,73 @@
+"""
+Responsive variants of post images.
+
+Every post image is cropped to the card aspect ratio and saved in
+several widths, as WebP and as a JPEG fallback. Templates offer them
+through srcset, so small screens download small files.
+"""
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import Post, PostImageVariant
+
+EXTENSIONS = {
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+}
+
+
+def _digest(file):
+    sha1 = hashlib.sha1()
+    for chunk in file.chunks():
+        sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _widths(source_width):
+    # Upscaling only makes files bigger, the smallest variant is always
+    # kept so every image has at least one.
+    widths = sorted(settings.POST_IMAGE_VARIANT_WIDTHS)
+    return [widths[0]] + [
+        width for width in widths[1:] if width <= source_width]
+
+
+def generate(post_id):
+    """Create missing variants of the post image."""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return
+    source = post.image.name
+    if PostImageVariant.objects.filter(
+            post_id=post_id, source=source).exists():
+        return
+    aspect_width, aspect_height = settings.POST_IMAGE_VARIANT_ASPECT
+    variants = []
+    with post.image.open('rb') as file:
+        digest = _digest(file)
+        file.seek(0)
+        image = ImageOps.exif_transpose(Image.open(file)).convert('RGB')
+    for width in _widths(image.width):
+        height = round(width * aspect_height / aspect_width)
+        resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        for image_format, extension in EXTENSIONS.items():
+            # Names depend on the content only, so the files never
+            # change and may be cached forever.
+            name = (f'posts/variants/{digest[:2]}/'
+                    f'{digest}-{width}.{extension}')
+            if not default_storage.exists(name):
+                buffer = BytesIO()
+                resized.save(
+                    buffer, image_format,
+                    quality=settings.POST_IMAGE_VARIANT_QUALITY)
+                name = default_storage.save(
+                    name, ContentFile(buffer.getvalue()))
+            variants.append(PostImageVariant(
+                post_id=post_id, source=source, file=name,
+                width=width, height=height, format=extension))
+    PostImageVariant.objects.filter(post_id=post_id).delete()
+    PostImageVariant.objects.bulk_create(variants)
@@ -1,10 +1,25 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.cache import caches
+from django.db import transaction
+from django.http import (Http404, HttpResponse, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.response import TemplateResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
+from . import export
+from . import search as post_search
+from . import graph, thumbnails, timeline, updates
+from .metrics import recorder
+from .cache import feed_cache_context, page_etag
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post
+from .pagination import CursorPaginator, get_feed_page
+from .throttle import counters as throttle_counters, throttle
 
 User = get_user_model()
 
@@ -24,82 +39,186 @@ def server_error(request):
     return render(request, 'misc/500.html', status=500)
 
 
+def _index_etag(request):
+    return page_etag(request, 'index')
+
+
+def _group_etag(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list('pk', flat=True).first()
+    if group_id is None:
+        return None
+    return page_etag(request, f'group:{group_id}')
+
+
+def _profile_etag(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    scopes = [f'author:{author_id}']
+    if request.user.is_authenticated:
+        # Follows of the viewer change the suggestions in the sidebar.
+        scopes.append(f'author:{request.user.pk}')
+    return page_etag(request, *scopes)
+
+
+def _post_etag(request, username, post_id):
+    # Post edits, comments and follows of the author all bump the
+    # author scope.
+    # Without the feed ordering the lookup by pk needs no sorting.
+    author_id = Post.objects.filter(
+        pk=post_id, author__username=username).order_by().values_list(
+        'author_id', flat=True).first()
+    if author_id is None:
+        return None
+    scopes = [f'author:{author_id}']
+    if request.user.is_authenticated:
+        # Follows of the viewer change the suggestions in the sidebar.
+        scopes.append(f'author:{request.user.pk}')
+    return page_etag(request, *scopes)
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_index_etag)
 def index(request):
     """
     Collect 10 posts, sorted by time, on one page.
-    Also cache post list for 20 seconds.
+    Also cache rendered post list until a post or a comment changes.
     """
-    post_list = Post.objects.select_related('group')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    context = {
-        'page': page,
-        'paginator': paginator,
-    }
-    return render(request, 'index.html', context)
+    post_list = Post.objects.select_related(
+        'author', 'group').prefetch_related('image_variants')
+    context = feed_cache_context(request, 'index_page', 'index')
+    if context['feed_fragment'] is None:
+        context.update(get_feed_page(request, post_list))
+    return TemplateResponse(request, 'index.html', context)
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_group_etag)
 def group_posts(request, slug):
     """Collect 10 posts, sorted by time, on one group page."""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = group.posts.select_related(
+        'author', 'group').prefetch_related('image_variants')
     context = {
-        'page': page,
         'group': group,
-        'paginator': paginator,
+        **feed_cache_context(request, 'group_page', f'group:{group.pk}'),
+    }
+    if context['feed_fragment'] is None:
+        context.update(get_feed_page(request, post_list))
+    return TemplateResponse(request, 'group.html', context)
+
+
+def search(request):
+    """Show posts matching the query, best matches first."""
+    query = request.GET.get('q', '').strip()
+    page = post_search.search_page(
+        query, request.GET.get('after'), request.GET.get('before'))
+    context = {
+        'query': query,
+        'page': page,
     }
-    return render(request, 'group.html', context)
+    return TemplateResponse(request, 'search.html', context)
 
 
 @login_required
+@throttle('post')
+@transaction.atomic
 def new_post(request):
     """Add a new post from an authorized user."""
-    form = PostForm(request.POST or None, files=request.FILES or None)
+    form = PostForm(
+        request.POST or None, files=request.FILES or None,
+        instance=Post(author=request.user))
     if form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        post = form.save()
+        thumbnails.enqueue_post(post)
         return redirect('posts:index')
-    return render(request, 'new_post.html', {'form': form})
+    return TemplateResponse(request, 'new_post.html', {'form': form})
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_profile_etag)
 def profile(request, username):
     """Show all user posts on profile page."""
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username)
+    post_list = author.posts.select_related(
+        'author', 'group').prefetch_related('image_variants')
     context = {
-        'page': page,
         'author': author,
-        'paginator': paginator,
+        **feed_cache_context(request, 'profile_page', f'author:{author.pk}'),
     }
+    if context['feed_fragment'] is None:
+        context.update(get_feed_page(request, post_list))
     if request.user.is_authenticated:
         subscribe = Follow.objects.filter(
             user=request.user, author=author).exists()
         context['subscribe'] = subscribe
-        return render(request, 'profile.html', context)
-    return render(request, 'profile.html', context)
+        context.update(_follow_suggestions(request.user, author))
+        return TemplateResponse(request, 'profile.html', context)
+    return TemplateResponse(request, 'profile.html', context)
+
+
+def _follow_suggestions(user, author):
+    follow_graph = graph.get_graph()
+    if follow_graph is None:
+        # No suggestions while the graph is loading.
+        mutual = Follow.objects.filter(
+            user=user, author=author,
+            author__follower__author=user).exists()
+        return {'suggestions': [], 'mutual': mutual}
+    ids = follow_graph.suggestions(user.pk, settings.FOLLOW_SUGGESTIONS)
+    users = User.objects.in_bulk(ids)
+    return {
+        'suggestions': [users[pk] for pk in ids if pk in users],
+        'mutual': follow_graph.is_mutual(user.pk, author.pk),
+    }
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_post_etag)
 def post_view(request, username, post_id):
     """Show one post info."""
-    post = get_object_or_404(Post, pk=post_id, author__username=username)
+    post = get_object_or_404(
+        Post.objects.select_related(
+            'author__counters', 'group').prefetch_related('image_variants'),
+        pk=post_id, author__username=username)
     author = post.author
-    comments = post.comments.all()
+    page = _comments_page(request, post)
     form = CommentForm()
     context = {
         'form': form,
         'post': post,
         'author': author,
-        'comments': comments,
+        'comments': post.comments.all(),
+        'comments_page': page,
+    }
+    return TemplateResponse(request, 'post.html', context)
+
+
+def _comments_page(request, post):
+    # The (post, -created, -id) index serves every page with a seek.
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE, ordering=('-created', '-id'))
+    return paginator.get_page(after=request.GET.get('after'))
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_post_etag)
+def post_comments(request, username, post_id):
+    """Render the next comments of the post for the "more" button."""
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        pk=post_id, author__username=username)
+    page = _comments_page(request, post)
+    context = {
+        'post': post,
+        'author': post.author,
+        'comments_page': page,
     }
-    return render(request, 'post.html', context)
+    return TemplateResponse(request, 'includes/comment_list.html', context)
 
 
 def post_edit(request, username, post_id):
@@ -111,6 +230,8 @@ def post_edit(request, username, post_id):
             request.POST or None, files=request.FILES or None, instance=post)
         if form.is_valid():
             form.save()
+            if 'image' in form.changed_data:
+                thumbnails.enqueue_post(post)
             return redirect('posts:post', username=username, post_id=post_id)
     else:
         return redirect('posts:post', username=author, post_id=post_id)
@@ -118,10 +239,12 @@ def post_edit(request, username, post_id):
         'post': post,
         'form': form,
     }
-    return render(request, 'new_post.html', context)
+    return TemplateResponse(request, 'new_post.html', context)
 
 
 @login_required
+@throttle('comment')
+@transaction.atomic
 def add_comment(request, username, post_id):
     """Add a new comment from an authorized user."""
     post = get_object_or_404(Post, author__username=username, pk=post_id)
@@ -137,18 +260,14 @@ def add_comment(request, username, post_id):
 @login_required
 def follow_index(request):
     """Show all posts of all following authors to authorised user."""
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    context = {
-        'page': page,
-        'paginator': paginator,
-    }
-    return render(request, 'follow.html', context)
+    post_list = timeline.feed_for(request.user)
+    context = get_feed_page(request, post_list, timeline.FEED_ORDERING)
+    return TemplateResponse(request, 'follow.html', context)
 
 
 @login_required
+@throttle('follow', methods=('GET',))
+@transaction.atomic
 def profile_follow(request, username):
     """Subscribe authorised user to author."""
     author = get_object_or_404(User, username=username)
@@ -158,8 +277,75 @@ def profile_follow(request, username):
 
 
 @login_required
+@throttle('follow', methods=('GET',))
+@transaction.atomic
 def profile_unfollow(request, username):
     """Unsubscribe authorised user from author."""
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+def _updates_feed(request):
+    """Posts of the feed asked for and the filter of its hub events."""
+    feed = request.GET.get('feed')
+    if feed == 'index':
+        return Post.objects.all(), lambda event: True
+    if feed == 'group':
+        group = get_object_or_404(Group, slug=request.GET.get('slug'))
+        return group.posts.all(), lambda event: event.group_id == group.pk
+    if feed == 'profile':
+        author = get_object_or_404(
+            User, username=request.GET.get('username'))
+        return author.posts.all(), lambda event: event.author_id == author.pk
+    if feed == 'follow' and request.user.is_authenticated:
+        authors = set(Follow.objects.filter(
+            user=request.user).values_list('author_id', flat=True))
+        return (Post.objects.filter(author_id__in=authors),
+                lambda event: event.author_id in authors)
+    raise Http404
+
+
+@cache_control(private=True, no_cache=True)
+def feed_updates(request):
+    """Long-poll for the ids of the posts published in a feed."""
+    queryset, matches = _updates_feed(request)
+    after = request.GET.get('after', '')
+    ids, cursor = updates.new_posts(
+        queryset, matches, int(after) if after.isdigit() else None,
+        settings.UPDATES_TIMEOUT, settings.UPDATES_MAX_WAITING)
+    if ids is None:
+        response = HttpResponse(status=204)
+        response['Retry-After'] = settings.UPDATES_RETRY_AFTER
+        return response
+    return JsonResponse({'posts': ids, 'cursor': cursor})
+
+
+@login_required
+def export_data(request):
+    """Download all posts, comments and images of the user as zip."""
+    response = StreamingHttpResponse(
+        export.iter_export(request.user), content_type='application/zip')
+    response['Content-Disposition'] = (
+        f'attachment; filename="yatube-{request.user.username}.zip"')
+    return response
+
+
+@staff_member_required
+def view_metrics(request):
+    """Show rolling per-view cost percentiles of this process."""
+    return JsonResponse(recorder.summary())
+
+
+@staff_member_required
+def throttle_stats(request):
+    """Show admitted and rejected writes per scope in this process."""
+    return JsonResponse(throttle_counters.summary())
+
+
+@staff_member_required
+def cache_stats(request):
+    """Show hits and misses of the cache tiers in this process."""
+    return JsonResponse({
+        alias: caches[alias].stats() for alias in settings.CACHES
+        if hasattr(caches[alias], 'stats')})
@@ -1,10 +1,43 @@
+import re
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
+from django.core.exceptions import ValidationError
+from django.urls import get_resolver
 
 User = get_user_model()
 
+SEGMENT = re.compile(r'[\w.@+-]+')
+
+
+def page_prefixes(patterns=None):
+    """
+    First path segments of the site pages. Profiles live at
+    /<username>/, the pages starting with a fixed segment would shadow
+    the profile of the user named so.
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    prefixes = set()
+    for pattern in patterns:
+        route = str(pattern.pattern).lstrip('^')
+        if not route and hasattr(pattern, 'url_patterns'):
+            prefixes |= page_prefixes(pattern.url_patterns)
+            continue
+        segment = route.split('/')[0]
+        if SEGMENT.fullmatch(segment):
+            prefixes.add(segment)
+    return prefixes
+
 
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+    def clean_username(self):
+        username = self.cleaned_data['username']
+        if username in page_prefixes():
+            raise ValidationError(
+                'Это имя занято адресом страницы сайта.', code='reserved')
+        return username
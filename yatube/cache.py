@@ -0,0 +1,311 @@
+"""
+Two-tier cache backend.
+
+TwoTierCache keeps a bounded LRU of recently used values in the process
+in front of a shared backend, configured as another alias in
+settings.CACHES, so all workers fill and invalidate one cache while
+most reads never leave the process.
+
+Keys are spread over STAMP_BUCKETS buckets, each with a version stamp
+in the shared tier. Every write bumps the stamp of its bucket; at the
+start of each request, and at least every SYNC_INTERVAL seconds
+outside of requests, the process reads all the stamps with one
+get_many and drops its local entries of the buckets changed by other
+processes. LOCAL_TIMEOUT bounds how long a local entry may outlive a
+change the stamps missed, such as a shared entry culled by the backend.
+"""
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.signals import request_started
+
+STAMP_KEY = 'two-tier-stamp:{}'
+
+_MISSING = object()
+
+# Local tiers by location, shared by the threads of the process.
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def _new_stamp():
+    # Stamps start from the clock, so a stamp lost with the shared
+    # cache never comes back with a value some process already knows.
+    return int(time.time() * 1000)
+
+
+class LocalTier:
+    """LRU of pickled values evicted by count, size and age."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self.stamps = {}
+        self.synced = None
+        self.stale = True
+        self._entries = OrderedDict()
+        self._bucket_keys = defaultdict(set)
+        self._bytes = 0
+        self._stats = {
+            'local': {'hits': 0, 'misses': 0},
+            'shared': {'hits': 0, 'misses': 0},
+        }
+
+    def count(self, tier, event, number=1):
+        with self.lock:
+            self._stats[tier][event] += number
+
+    def get(self, key):
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self._stats['local']['misses'] += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self._stats['local']['hits'] += 1
+            data = entry[0]
+        return pickle.loads(data)
+
+    def set(self, key, value, timeout, bucket):
+        if timeout is not None and timeout <= 0:
+            self.delete(key)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self._drop(key)
+            if len(data) > self.max_bytes:
+                return
+            self._entries[key] = (data, time.monotonic() + timeout, bucket)
+            self._bucket_keys[bucket].add(key)
+            self._bytes += len(data)
+            while (len(self._entries) > self.max_entries
+                   or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self.lock:
+            self._drop(key)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+            self._bucket_keys[entry[2]].discard(key)
+
+    def drop_bucket(self, bucket):
+        with self.lock:
+            for key in list(self._bucket_keys.pop(bucket, ())):
+                self._drop(key)
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+            self._bucket_keys.clear()
+            self._bytes = 0
+            self.stamps = {}
+            self.stale = True
+
+    def stats(self):
+        with self.lock:
+            stats = {
+                tier: dict(counts) for tier, counts in self._stats.items()}
+            stats['local'].update(
+                entries=len(self._entries), bytes=self._bytes)
+        return stats
+
+
+def _mark_stale(**kwargs):
+    with _tiers_lock:
+        tiers = list(_tiers.values())
+    for tier in tiers:
+        tier.stale = True
+
+
+request_started.connect(_mark_stale, dispatch_uid='two_tier_cache_stale')
+
+
+class TwoTierCache(BaseCache):
+    """
+    Cache backend with a per-process LRU in front of a shared backend.
+
+    OPTIONS: SHARED, the alias of the shared backend; MAX_ENTRIES and
+    MAX_BYTES, the bounds of the local tier; LOCAL_TIMEOUT, the longest
+    time a value is kept locally; STAMP_BUCKETS and SYNC_INTERVAL.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._buckets = options.get('STAMP_BUCKETS', 16)
+        self._sync_interval = options.get('SYNC_INTERVAL', 1)
+        with _tiers_lock:
+            self._tier = _tiers.setdefault(location, LocalTier(
+                self._max_entries, options.get('MAX_BYTES', 16 * 2 ** 20)))
+
+    @property
+    def _shared(self):
+        return caches[self._shared_alias]
+
+    def _bucket(self, local_key):
+        return zlib.crc32(local_key.encode()) % self._buckets
+
+    def _local_timeout_for(self, timeout):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def _sync(self):
+        """Drop the local entries of the buckets changed elsewhere."""
+        tier = self._tier
+        now = time.monotonic()
+        if (not tier.stale and tier.synced is not None
+                and now - tier.synced < self._sync_interval):
+            return
+        tier.stale = False
+        keys = {STAMP_KEY.format(bucket): bucket
+                for bucket in range(self._buckets)}
+        # A missing stamp is known as None until some write sets it.
+        stamps = self._shared.get_many(list(keys))
+        with tier.lock:
+            for key, bucket in keys.items():
+                stamp = stamps.get(key)
+                if bucket not in tier.stamps or tier.stamps[bucket] != stamp:
+                    tier.drop_bucket(bucket)
+                    tier.stamps[bucket] = stamp
+            tier.synced = now
+
+    def _bump(self, buckets):
+        """Move the stamps of the buckets written by this process."""
+        tier = self._tier
+        for bucket in set(buckets):
+            key = STAMP_KEY.format(bucket)
+            try:
+                stamp = self._shared.incr(key)
+            except ValueError:
+                stamp = _new_stamp()
+                self._shared.set(key, stamp, None)
+            with tier.lock:
+                # Any other step means another process wrote in between.
+                if tier.stamps.get(bucket) != stamp - 1:
+                    tier.drop_bucket(bucket)
+                tier.stamps[bucket] = stamp
+
+    def _store(self, local_key, value, timeout=DEFAULT_TIMEOUT):
+        self._tier.set(
+            local_key, value, self._local_timeout_for(timeout),
+            self._bucket(local_key))
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        local_key = self.make_key(key, version)
+        value = self._tier.get(local_key)
+        if value is not _MISSING:
+            return value
+        value = self._shared.get(key, _MISSING, version)
+        if value is _MISSING:
+            self._tier.count('shared', 'misses')
+            return default
+        self._tier.count('shared', 'hits')
+        self._store(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missing = {}
+        for key in keys:
+            local_key = self.make_key(key, version)
+            value = self._tier.get(local_key)
+            if value is _MISSING:
+                missing[key] = local_key
+            else:
+                found[key] = value
+        if missing:
+            shared = self._shared.get_many(list(missing), version)
+            self._tier.count('shared', 'hits', len(shared))
+            self._tier.count('shared', 'misses', len(missing) - len(shared))
+            for key, value in shared.items():
+                self._store(missing[key], value)
+            found.update(shared)
+        return found
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version) is not _MISSING
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self._shared.add(key, value, timeout, version):
+            return False
+        local_key = self.make_key(key, version)
+        self._bump([self._bucket(local_key)])
+        self._store(local_key, value, timeout)
+        return True
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._shared.set(key, value, timeout, version)
+        local_key = self.make_key(key, version)
+        self._bump([self._bucket(local_key)])
+        self._store(local_key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        # Wrappers like the debug toolbar's may lose the failed keys.
+        failed = self._shared.set_many(data, timeout, version) or []
+        local_keys = {
+            key: self.make_key(key, version)
+            for key in data if key not in failed}
+        self._bump(
+            self._bucket(local_key) for local_key in local_keys.values())
+        for key, local_key in local_keys.items():
+            self._store(local_key, data[key], timeout)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        # The value doesn't change, the local copy is just refetched.
+        self._tier.delete(self.make_key(key, version))
+        return self._shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self._shared.delete(key, version)
+        local_key = self.make_key(key, version)
+        self._tier.delete(local_key)
+        self._bump([self._bucket(local_key)])
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self._shared.delete_many(keys, version)
+        local_keys = [self.make_key(key, version) for key in keys]
+        for local_key in local_keys:
+            self._tier.delete(local_key)
+        self._bump(self._bucket(local_key) for local_key in local_keys)
+
+    def incr(self, key, delta=1, version=None):
+        value = self._shared.incr(key, delta, version)
+        local_key = self.make_key(key, version)
+        self._bump([self._bucket(local_key)])
+        self._store(local_key, value)
+        return value
+
+    def clear(self):
+        # The stamps go with the shared cache, so every process drops
+        # its local entries on its next sync.
+        self._shared.clear()
+        self._tier.clear()
+
+    def close(self, **kwargs):
+        self._shared.close(**kwargs)
+
+    def stats(self):
+        """Hits and misses of both tiers in this process."""
+        return self._tier.stats()
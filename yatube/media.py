@@ -0,0 +1,135 @@
+"""
+Serving of uploaded media.
+
+MEDIA_SERVE_MODE chooses who sends the bytes of a file:
+
+- 'python' streams it from the worker in chunks, answering Range and
+  If-Modified-Since requests;
+- 'x-accel-redirect' hands it to nginx with an internal redirect to
+  MEDIA_ACCEL_PREFIX, served by a location like
+  `location /internal-media/ { internal; alias /srv/yatube/media/; }`;
+- 'x-sendfile' hands the absolute path to Apache mod_xsendfile or
+  lighttpd.
+
+Files under MEDIA_IMMUTABLE_PREFIXES are named after the digest of
+their content and never change, they are cached for a year as
+immutable, the rest of the media for MEDIA_CACHE_SECONDS.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified, StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+CHUNK_SIZE = 64 * 1024
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Only single ranges are answered, for the rest the whole file is sent
+# as HTTP allows.
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _cache_control(path):
+    if path.startswith(settings.MEDIA_IMMUTABLE_PREFIXES):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={settings.MEDIA_CACHE_SECONDS}'
+
+
+def _byte_range(request, size, last_modified):
+    """(start, end) of the requested range or None for the whole file."""
+    match = BYTE_RANGE.match(request.META.get('HTTP_RANGE', '').strip())
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not match or if_range and if_range != last_modified:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    elif last:
+        # The last bytes of the file, bytes=-0 asks for none of them.
+        start = max(0, size - int(last)) if int(last) else size
+        end = size - 1
+    else:
+        return None
+    return start, end
+
+
+def _chunks(full_path, start, length):
+    with open(full_path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _stream(request, full_path, stat, content_type):
+    last_modified = http_date(stat.st_mtime)
+    if not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat.st_mtime, stat.st_size):
+        return HttpResponseNotModified()
+    size = stat.st_size
+    byte_range = _byte_range(request, size, last_modified)
+    if byte_range is None:
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type)
+        response.block_size = CHUNK_SIZE
+    else:
+        start, end = byte_range
+        if start >= size:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            response['Accept-Ranges'] = 'bytes'
+            return response
+        response = StreamingHttpResponse(
+            _chunks(full_path, start, end - start + 1),
+            status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Last-Modified'] = last_modified
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve(request, path):
+    """Send a file of MEDIA_ROOT in the configured MEDIA_SERVE_MODE."""
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    content_type = (
+        mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == 'python':
+        response = _stream(
+            request, full_path, os.stat(full_path), content_type)
+    else:
+        # The front-end server sends the body and answers conditional
+        # and range requests itself.
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = (
+                settings.MEDIA_ACCEL_PREFIX + quote(path))
+        elif mode == 'x-sendfile':
+            response['X-Sendfile'] = full_path
+        else:
+            raise ValueError(f'Unknown MEDIA_SERVE_MODE {mode!r}')
+    response['Cache-Control'] = _cache_control(path)
+    return response
@@ -0,0 +1,98 @@
+"""
+Read replicas.
+
+ReplicaRouter sends the reads of the views listed in REPLICA_VIEWS to
+one of the REPLICA_DATABASES, everything else goes to the primary.
+ReplicaMiddleware picks the replica for the request and keeps users who
+have just written something on the primary for REPLICA_PIN_SECONDS
+with a cookie, so they see their own changes while the replicas catch
+up. Without replicas configured every query goes to the primary.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+
+PIN_COOKIE = 'primary_pin'
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_state = threading.local()
+
+
+def current_replica():
+    """Alias of the replica serving the reads of this thread or None."""
+    return getattr(_state, 'replica', None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = current_replica()
+        # Reads inside a transaction must see what it has written.
+        if replica is None or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, migrated with it.
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+class WriteDetector:
+    """Execute wrapper noticing data changing statements."""
+
+    def __init__(self):
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+            self.wrote = True
+        return execute(sql, params, many, context)
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.read_replica = None
+        detector = WriteDetector()
+        try:
+            with connections[PRIMARY].execute_wrapper(detector):
+                response = self.get_response(request)
+        finally:
+            _state.replica = None
+        if detector.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (not settings.REPLICA_DATABASES
+                or request.method not in ('GET', 'HEAD')
+                or request.resolver_match.view_name
+                not in settings.REPLICA_VIEWS
+                or PIN_COOKIE in request.COOKIES):
+            return None
+        # The session and the user are read from the primary, a user
+        # who has just signed up or logged in may be missing on a
+        # replica.
+        request.user.pk
+        request.read_replica = _state.replica = random.choice(
+            settings.REPLICA_DATABASES)
+        return None
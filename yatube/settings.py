@@ -16,8 +16,9 @@ ALLOWED_HOSTS = [
 
 INSTALLED_APPS = [
     'users',
-    'posts',
+    'posts.apps.PostsConfig',
     'about',
+    'api',
     'sorl.thumbnail',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -30,11 +31,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'posts.metrics.ViewMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yatube.routers.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -61,14 +64,66 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+TEST_RUNNER = 'yatube.testing.TestRunner'
+
+
+# Pragmas set on every SQLite connection by the yatube.sqlite backend.
+# WAL lets readers work while a writer commits, busy_timeout (ms) makes
+# writers wait for the lock instead of failing.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32 * 1024,
+    'busy_timeout': 5000,
+}
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Aliases of read replicas, e.g. YATUBE_REPLICAS=replica1,replica2.
+# Locally they are copies of the SQLite file made by refresh_replicas.
+REPLICA_DATABASES = [
+    alias for alias in os.environ.get('YATUBE_REPLICAS', '').split(',')
+    if alias]
+
+for alias in REPLICA_DATABASES:
+    DATABASES[alias] = {
+        'ENGINE': 'yatube.sqlite',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {'pragmas': {**SQLITE_PRAGMAS, 'query_only': 'ON'}},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['yatube.routers.ReplicaRouter']
+
+# Views whose reads may be served by a replica.
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_posts',
+    'posts:profile',
+    'posts:post',
+    'posts:post_comments',
+    'posts:follow_index',
+)
+
+# How long a user who has written something reads from the primary.
+REPLICA_PIN_SECONDS = 10
+
+# Longest expected replication lag, pages read from replicas are cached
+# for about this long.
+REPLICA_MAX_LAG = 5
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -105,6 +160,21 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Who sends /media/ files, see yatube.media: 'python' streams them from
+# the worker, 'x-accel-redirect' (nginx) and 'x-sendfile' (Apache,
+# lighttpd) leave it to the front-end server.
+MEDIA_SERVE_MODE = os.environ.get('YATUBE_MEDIA_SERVE_MODE', 'python')
+
+# Internal nginx location aliased to MEDIA_ROOT.
+MEDIA_ACCEL_PREFIX = '/internal-media/'
+
+# Media named after the digest of their content, cached as immutable.
+# Only the responsive variants are: sorl-thumbnail names its files after
+# the source name and the options, so they may change under one name.
+MEDIA_IMMUTABLE_PREFIXES = ('posts/variants/',)
+
+MEDIA_CACHE_SECONDS = 24 * 60 * 60
+
 LOGIN_URL = '/auth/login/'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -113,12 +183,137 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Every process keeps recently used values in its own LRU in front of
+# the file cache shared by all the workers of the host, see
+# yatube/cache.py. SHARED may name a memcached alias instead when the
+# workers run on several hosts.
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'yatube.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 1000,
+            'MAX_BYTES': 16 * 2 ** 20,
+            'LOCAL_TIMEOUT': 5,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
 }
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+POSTS_PER_PAGE = 10
+
+COMMENTS_PER_PAGE = 20
+
+# 'offset' shows numbered pages, 'cursor' switches feeds to keyset
+# pagination with ?after=/?before= tokens.
+POSTS_PAGINATION_MODE = 'offset'
+
+# Rendered feed pages are invalidated by post and comment changes,
+# the timeout only limits how long unused pages occupy the cache.
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Cards are keyed by the post version, which grows with every change
+# shown on the card, renames of its author and group included, so the
+# timeout only limits how long unused cards occupy the cache.
+POST_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# How long a request for new posts of a feed waits for one, seconds.
+UPDATES_TIMEOUT = 25
+
+# Requests waiting for new posts at once in a process, each holds
+# a worker thread. Polls over the limit get 204 and ask again after
+# UPDATES_RETRY_AFTER seconds.
+UPDATES_MAX_WAITING = 10
+
+UPDATES_RETRY_AFTER = 30
+
+# How often the in-memory follow graph is reloaded from the database to
+# bring in follows made by other processes, seconds.
+FOLLOW_GRAPH_MAX_AGE = 10 * 60
+
+# Whether requests start loading the follow graph in a background
+# thread, without it the graph is only loaded by graph.reload().
+FOLLOW_GRAPH_AUTOLOAD = True
+
+# Number of users offered in the "who to follow" widget.
+FOLLOW_SUGGESTIONS = 5
+
+# Token buckets of the write views, see posts.throttle:
+# scope -> {'user' | 'ip': (burst, seconds)}, a bucket admits up to
+# burst requests at once and refills at burst per seconds.
+WRITE_RATE_LIMITS = {
+    'post': {'user': (10, 60), 'ip': (30, 60)},
+    'comment': {'user': (20, 60), 'ip': (60, 60)},
+    'follow': {'user': (30, 60), 'ip': (100, 60)},
+}
+
+# Reverse proxies whose X-Forwarded-For names the client of a request.
+RATE_LIMIT_PROXIES = ['127.0.0.1']
+
+# Number of recent requests per view kept for the metrics percentiles.
+VIEW_METRICS_WINDOW = 1000
+
+# Maximum number of SQL queries per view; exceeding views are logged
+# and fail posts.tests.test_queries.
+VIEW_QUERY_BUDGETS = {
+    'posts:index': 6,
+    'posts:group_posts': 7,
+    'posts:profile': 9,
+    'posts:post': 7,
+    'posts:follow_index': 6,
+    'posts:new_post': 10,
+    'posts:add_comment': 10,
+    'posts:profile_follow': 15,
+    'posts:profile_unfollow': 12,
+}
+
+# Page size of the JSON API lists and the most objects one ids=
+# lookup may ask for.
+API_PAGE_SIZE = 20
+
+API_MAX_IDS = 100
+
+# Thumbnails generated for every uploaded post image:
+# alias -> (geometry, sorl-thumbnail options).
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Size of the thumbnail worker pool, 0 generates right after the commit
+# in the request thread.
+POST_THUMBNAIL_WORKERS = 2
+
+# Responsive variants of post images, offered to browsers via srcset.
+POST_IMAGE_VARIANT_WIDTHS = (320, 640, 960)
+
+POST_IMAGE_VARIANT_ASPECT = (960, 339)
+
+POST_IMAGE_VARIANT_QUALITY = 80
+
+# Uploads always go to temporary files on disk in chunks instead of
+# being read into memory.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+
+# Uploads with more pixels are rejected before decoding.
+POST_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+
+# Longest side of the stored original, bigger uploads are downscaled.
+POST_IMAGE_MAX_SIDE = 2560
+
+POST_IMAGE_QUALITY = 85
@@ -0,0 +1,33 @@
+"""
+SQLite backend with connection pragmas.
+
+OPTIONS['pragmas'] maps pragma names to the values set on every new
+connection, e.g. WAL journal, synchronous, mmap_size, cache_size and
+busy_timeout. OPTIONS['transaction_mode'] is added to the BEGIN of
+transactions: an IMMEDIATE transaction takes the write lock when it
+starts, so concurrent writers wait for busy_timeout instead of failing
+with "database is locked" when their read lock can't be upgraded.
+"""
+from django.db.backends.sqlite3 import base
+
+BACKEND_OPTIONS = ('pragmas', 'transaction_mode')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # The rest of OPTIONS goes to sqlite3.connect().
+        for name in BACKEND_OPTIONS:
+            params.pop(name, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = self.settings_dict['OPTIONS'].get('pragmas', {})
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode', '')
+        self.cursor().execute(f'BEGIN {mode}'.rstrip())
@@ -0,0 +1,69 @@
+"""
+Settings of the test runs.
+
+Background threads opening their own connections to the in-memory test
+database lock its tables under the tests instead of waiting, so the
+tests do their work inline. The caches are kept in memory and emptied
+before every test: ids start over in each test and would find entries
+of the previous ones.
+
+TestRunner applies this to `manage.py test`, conftest.py to every
+pytest run.
+"""
+import unittest
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import override_settings
+from django.test.runner import DebugSQLTextTestResult, DiscoverRunner
+
+TEST_SETTINGS = {
+    'POST_THUMBNAIL_WORKERS': 0,
+    'FOLLOW_GRAPH_AUTOLOAD': False,
+    # The two tiers of settings.CACHES over memory, so the runs neither
+    # read nor leave entries in CACHE_DIR.
+    'CACHES': {
+        'default': {
+            'BACKEND': 'yatube.cache.TwoTierCache',
+            'LOCATION': 'test',
+            'OPTIONS': {'SHARED': 'shared'},
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'test-shared',
+        },
+    },
+}
+
+
+def clear_caches():
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+class ClearCachesMixin:
+    def startTest(self, test):
+        clear_caches()
+        super().startTest(test)
+
+
+class TestResult(ClearCachesMixin, unittest.TextTestResult):
+    pass
+
+
+class DebugSQLTestResult(ClearCachesMixin, DebugSQLTextTestResult):
+    pass
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(**TEST_SETTINGS)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def get_resultclass(self):
+        return DebugSQLTestResult if self.debug_sql else TestResult
@@ -4,13 +4,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.urls import include, path, re_path
-from django.views.static import serve
+
+from yatube import media
 
 urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('admin/', admin.site.urls),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
     path('', include('posts.urls', namespace='posts')),
 ]
 
@@ -19,8 +21,6 @@ handler404 = 'posts.views.page_not_found' # noqa
 handler500 = 'posts.views.server_error' # noqa
 
 if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(
         settings.STATIC_URL, document_root=settings.STATIC_ROOT)
     import debug_toolbar
@@ -28,5 +28,4 @@ if settings.DEBUG:
 
 urlpatterns += staticfiles_urlpatterns()
 
-urlpatterns += [re_path(
-    r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT})]
+urlpatterns += [re_path(r'^media/(?P<path>.*)$', media.serve)]